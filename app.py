@@ -1,18 +1,245 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response, stream_with_context, has_request_context, send_from_directory, abort
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from functools import wraps
+from flask_sqlalchemy.session import Session as FlaskSession
+from markupsafe import Markup, escape
+from jinja2 import FileSystemBytecodeCache
+from dotenv import load_dotenv
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from functools import lru_cache, wraps
+import base64
+import bisect
+import click
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import mimetypes
+import operator
 import os
+import queue
+import random
+import re
+import secrets
+import struct
+import sys
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: без нее статика и ответы сжимаются только gzip
+    brotli = None
+
+# Настройки окружения можно положить в файл .env рядом с app.py
+load_dotenv()
 
 app = Flask(__name__)
 
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
 # ========== КОНФИГУРАЦИЯ ==========
-app.config['SECRET_KEY'] = 'dev-secret-key-change-this-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///college_repair.db'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-this-in-production')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///college_repair.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['REQUESTS_PAGE_SIZE'] = 50  # Заявок на одной странице списка
+app.config['REQUESTS_PAGE_SIZE_MAX'] = 200  # Максимум для параметра limit
+app.config['USER_CACHE_TTL'] = 30  # Секунд хранения пользователя в кэше процесса
+app.config['EXPORT_BATCH_SIZE'] = 1000  # Строк, читаемых из курсора БД за раз при выгрузке
+app.config['DUPLICATE_THRESHOLD'] = 0.5  # Сходство описаний (доля совпавших MinHash), с которого заявка считается дублем
+app.config['DUPLICATE_CANDIDATES'] = 200  # Открытых заявок одного компьютера, сравниваемых при создании
+app.config['ARCHIVE_AFTER_DAYS'] = env_int('ARCHIVE_AFTER_DAYS', 180)  # Завершенные заявки старше этого уходят в архив
+app.config['ARCHIVE_BATCH_SIZE'] = 500  # Заявок, переносимых в архив одной короткой транзакцией
+app.config['ARCHIVE_BATCH_PAUSE'] = 0.05  # Секунд между пачками, чтобы пропустить другие записи
+app.config['BULK_STATUS_MAX'] = 500  # Изменений статуса в одном запросе /api/requests/status
+app.config['EVENTS_QUEUE_SIZE'] = 100  # Событий в очереди одного SSE-подписчика
+app.config['EVENTS_KEEPALIVE'] = 15  # Секунд между keepalive-комментариями SSE
+app.config['EVENTS_BROKER_URL'] = os.environ.get('EVENTS_BROKER_URL')  # postgresql://... - рассылка событий между процессами
+app.config['SEARCH_PAGE_SIZE'] = 20  # Результатов поиска на странице
+app.config['PASSWORD_HASH_ITERATIONS'] = 200000  # Стоимость PBKDF2-SHA256; рост - пересчет хэша при входе
+app.config['PASSWORD_POOL_SIZE'] = 4  # Потоков для хэширования и проверки паролей
+app.config['PASSWORD_POOL_TIMEOUT'] = 10  # Секунд ожидания свободного места в пуле
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED') == '1'  # Замеры запросов и /metrics
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # Authorization: Bearer <токен> для Prometheus; без него - только администратор
+app.config['SLOW_QUERY_MS'] = 100  # SQL-запросы дольше этого попадают в журнал и метрики
+app.config['PROFILE_SAMPLE_RATE'] = 0.0  # Доля запросов под cProfile (0 - выключено)
+app.config['PROFILE_THRESHOLD_MS'] = 500  # Профиль сохраняется, если запрос дольше этого
+app.config['PROFILE_DIR'] = 'profiles'  # Каталог для .prof-файлов
+app.config['FRAGMENT_CACHE_SIZE'] = env_int('FRAGMENT_CACHE_SIZE', 5000)  # Отрисованных строк/карточек в памяти (0 - без кэша)
+app.config['JINJA_BYTECODE_CACHE_DIR'] = os.environ.get('JINJA_BYTECODE_CACHE_DIR')  # Каталог скомпилированных шаблонов
+app.config['JOBS_WORKERS'] = env_int('JOBS_WORKERS', 2)  # Потоков фоновых задач в процессе (0 - только flask jobs-drain)
+app.config['JOBS_MAX_ATTEMPTS'] = 5  # Попыток выполнить задачу, после чего она помечается failed
+app.config['JOBS_RETRY_DELAY'] = 2  # Секунд до первого повтора, дальше задержка удваивается
+app.config['JOBS_LEASE'] = 300  # Секунд, через которые зависшая задача выдается снова
+app.config['JOBS_POLL_INTERVAL'] = 5  # Секунд между проверками очереди, если задач нет
+app.config['SERVE_BIND'] = os.environ.get('SERVE_BIND', '0.0.0.0:5000')  # Адрес рабочего сервера (flask serve)
+# Процессов gunicorn; без EVENTS_BROKER_URL события SSE не выходят за пределы процесса, поэтому один
+app.config['SERVE_WORKERS'] = env_int('SERVE_WORKERS', (os.cpu_count() or 1) * 2 + 1 if app.config['EVENTS_BROKER_URL'] else 1)
+app.config['SERVE_THREADS'] = env_int('SERVE_THREADS', 8 if app.config['SERVE_WORKERS'] > 1 else 32)  # Потоков в процессе
+# Каждый SSE-клиент занимает поток до закрытия вкладки; сверх лимита /api/events отвечает 503,
+# чтобы остальные потоки оставались для обычных запросов
+app.config['EVENTS_MAX_SUBSCRIBERS'] = env_int('EVENTS_MAX_SUBSCRIBERS', app.config['SERVE_THREADS'] // 2)
+app.config['SERVE_TIMEOUT'] = env_int('SERVE_TIMEOUT', 60)  # Секунд без ответа, после которых процесс перезапускается
+app.config['SERVE_GRACEFUL_TIMEOUT'] = env_int('SERVE_GRACEFUL_TIMEOUT', 30)  # Секунд на завершение запросов при остановке
+app.config['SERVE_PIDFILE'] = os.environ.get('SERVE_PIDFILE', os.path.join(app.instance_path, 'gunicorn.pid'))  # Для flask reload
+app.config['ASSETS_DIR'] = os.environ.get('ASSETS_DIR', os.path.join(app.static_folder, 'dist'))  # Вывод flask assets-build
+app.config['ASSETS_MAX_AGE'] = 365 * 24 * 3600  # Секунд кэша для файлов с хэшем в имени (Cache-Control: immutable)
+app.config['COMPRESS_MIN_SIZE'] = env_int('COMPRESS_MIN_SIZE', 1024)  # Ответы меньше этого (байт) не сжимаются
+app.config['COMPRESS_LEVEL'] = env_int('COMPRESS_LEVEL', 6)  # Уровень gzip для ответов (1-9)
+app.config['COMPRESS_BROTLI_LEVEL'] = env_int('COMPRESS_BROTLI_LEVEL', 5)  # Уровень brotli для ответов (0-11)
+app.config['COMPRESS_MIMETYPES'] = ('text/html', 'application/json', 'text/csv', 'text/plain', 'text/css',
+                                    'application/javascript', 'image/svg+xml')  # Что сжимать на лету
+
+# Подключение к БД
+def database_url(url):
+    # postgres:// SQLAlchemy не принимает, а без явного драйвера может выбрать не psycopg2
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            return 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+DATABASE_DIALECT = 'postgresql' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'sqlite'
+
+if DATABASE_DIALECT == 'postgresql':
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': env_int('DB_POOL_SIZE', 10),  # Постоянных соединений на процесс
+        'max_overflow': env_int('DB_MAX_OVERFLOW', 20),  # Дополнительных соединений при пиках
+        'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),  # Секунд ожидания свободного соединения
+        'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),  # Пересоздание соединений старше (с)
+        'pool_pre_ping': True  # Проверка соединения перед выдачей из пула
+    }
+
+# Реплики только для чтения: DATABASE_REPLICA_URLS=url1,url2. Маршруты с @read_only
+# читают с реплики, запись и все остальное идут в основную БД
+app.config['DATABASE_REPLICA_URLS'] = [database_url(url.strip()) for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['SQLALCHEMY_BINDS'] = {f'replica_{index}': url for index, url in enumerate(app.config['DATABASE_REPLICA_URLS'])}
+app.config['REPLICA_STICKY_SECONDS'] = env_int('REPLICA_STICKY_SECONDS', 10)  # Чтение с основной БД после записи
+
+# PRAGMA для каждого соединения SQLite; SQLITE_TUNING=0 оставляет настройки по умолчанию
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # Читатели не блокируют писателя
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # В WAL безопасно и без fsync на каждый коммит
+    'busy_timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),  # Ожидание блокировки вместо "database is locked"
+    'mmap_size': env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),  # Чтение файла БД через mmap
+    'cache_size': -env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)  # Кэш страниц (отрицательное - в КиБ)
+} if os.environ.get('SQLITE_TUNING', '1') == '1' else {}
 # ==================================
 
-db = SQLAlchemy(app)
+REQUEST_STATUSES = ('pending', 'in_progress', 'completed')
+REQUEST_PRIORITIES = ('low', 'medium', 'high')
+REQUEST_FILTERS = ('status', 'priority', 'location', 'date_from', 'date_to', 'archived')
+RESOLUTION_BUCKETS = (300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800,
+                      259200, 604800, 1209600, 2592000)  # Границы интервалов гистограмм времени ремонта (с)
+MINHASH_SIZE = 32  # Хэш-функций в подписи описания заявки
+EXPORT_FIELDS = ('id', 'computer_number', 'location', 'problem_description', 'status',
+                 'priority', 'created_at', 'updated_at', 'author')
+
+class RoutingSession(FlaskSession):
+    """Сессия, отправляющая запросы read-only маршрутов на реплику.
+
+    На основную БД идут: запись (flush и DML), запросы вне read-only маршрутов,
+    все запросы после записи в том же HTTP-запросе и запросы пользователя в
+    течение REPLICA_STICKY_SECONDS после его записи (видит свои изменения).
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif replica_allowed():
+                if 'replica_key' not in g:
+                    g.replica_key = random.choice(list(app.config['SQLALCHEMY_BINDS']))
+                return self._db.engines[g.replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def replica_allowed():
+    return (app.config['SQLALCHEMY_BINDS'] and g.get('read_only') and not g.get('db_wrote')
+            and session.get('primary_until', 0) < time.time())
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Применение SQLITE_PRAGMAS к новому соединению"""
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+with app.app_context():
+    for engine in db.engines.values():
+        if engine.dialect.name == 'sqlite':
+            db.event.listen(engine, 'connect', configure_sqlite_connection)
+
+def read_only(f):
+    """Маршрут только читает данные - его запросы можно выполнять на реплике"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.after_request
+def remember_write(response):
+    # После записи пользователь какое-то время читает с основной БД, пока реплика догоняет
+    if app.config['SQLALCHEMY_BINDS'] and g.get('db_wrote'):
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+def database_settings():
+    """Фактические настройки подключения к БД"""
+    engine = db.engine
+    settings = {
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool': type(engine.pool).__name__
+    }
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                settings[name] = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        else:
+            settings['server_version'] = connection.exec_driver_sql('SHOW server_version').scalar()
+    settings['replicas'] = [db.engines[key].url.render_as_string(hide_password=True)
+                            for key in app.config['SQLALCHEMY_BINDS']] or 'нет'
+    if hasattr(engine.pool, 'size'):
+        settings['pool_size'] = engine.pool.size()
+        settings['max_overflow'] = getattr(engine.pool, '_max_overflow', None)
+        settings['pool_timeout'] = getattr(engine.pool, '_timeout', None)
+        settings['pool_pre_ping'] = engine.pool._pre_ping
+    return settings
+
+def print_database_settings():
+    print("🗄  Настройки базы данных:")
+    for name, value in database_settings().items():
+        print(f"   {name}: {value}")
+
+def missing_tables():
+    """Таблицы моделей, которых нет в базе (нужен flask migrate)"""
+    return sorted(set(db.metadata.tables) - set(db.inspect(db.engine).get_table_names()))
+
+def add_missing_columns(table):
+    """ALTER TABLE ... ADD COLUMN для столбцов модели, которых нет в существующей таблице"""
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(table.name)}
+    with db.engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing:
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}')
+
+def end_read_transaction():
+    """Завершение читающей транзакции SQLite перед условным UPDATE.
+
+    В режиме WAL запись из транзакции со старым снимком сразу получает
+    SQLITE_BUSY (без ожидания busy_timeout), если кто-то успел записать раньше.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        db.session.commit()
 
 # Модели базы данных
 class User(db.Model):
@@ -23,7 +250,7 @@ class User(db.Model):
     full_name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    requests = db.relationship('RepairRequest', backref='author', lazy=True)
+    requests = db.relationship('RepairRequest', backref='author', lazy=True, foreign_keys='RepairRequest.user_id')
 
     def __repr__(self):
         return f'<User {self.username} - {self.role}>'
@@ -38,15 +265,1074 @@ class RepairRequest(db.Model):
     priority = db.Column(db.String(20), default='medium')  # low, medium, high
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    computer_key = db.Column(db.String(20))  # computer_number без регистра и разделителей
+    description_signature = db.Column(db.String(MINHASH_SIZE * 8))  # MinHash описания (hex)
+    assignee_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Специалист, взявший заявку в работу
+
+    # Составные индексы под фильтры и сортировку списков заявок
+    __table_args__ = (
+        db.Index('ix_repair_request_status_created', 'status', 'created_at'),
+        db.Index('ix_repair_request_user_created', 'user_id', 'created_at'),
+        db.Index('ix_repair_request_priority_created', 'priority', 'created_at'),
+        db.Index('ix_repair_request_updated', 'updated_at', 'id'),
+        # Очередь специалиста: старейшая ожидающая заявка каждого приоритета
+        db.Index('ix_repair_request_queue', 'status', 'priority', 'created_at'),
+        # Частичный индекс: поиск дублей смотрит только открытые заявки компьютера.
+        # Условие задается только для текущей СУБД: postgresql_where при SQLite
+        # заставил бы SQLAlchemy импортировать диалект PostgreSQL при запуске
+        db.Index('ix_repair_request_open_computer', 'computer_key', 'created_at',
+                 **{f'{DATABASE_DIALECT}_where': db.text("status != 'completed'")}),
+    )
 
     def __repr__(self):
         return f'<RepairRequest {self.id} - {self.computer_number}>'
 
+class RequestCounter(db.Model):
+    """Счетчик заявок в разрезе (статус, приоритет, аудитория).
+
+    Поддерживается при создании заявки и смене статуса, поэтому статистика
+    на главной панели не пересчитывается по всей таблице заявок.
+    """
+    status = db.Column(db.String(20), primary_key=True)
+    priority = db.Column(db.String(20), primary_key=True)
+    location = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<RequestCounter {self.status}/{self.priority}/{self.location}: {self.count}>'
+
+class ArchivedRepairRequest(db.Model):
+    """Завершенная заявка, перенесенная из repair_request (flask archive-requests).
+
+    id сохраняется, поэтому история статусов и присоединившиеся пользователи
+    продолжают ссылаться на ту же заявку.
+    """
+    __tablename__ = 'repair_request_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    computer_number = db.Column(db.String(20), nullable=False)
+    location = db.Column(db.String(100), nullable=False)
+    problem_description = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='completed')
+    priority = db.Column(db.String(20), default='medium')
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    computer_key = db.Column(db.String(20))
+    description_signature = db.Column(db.String(MINHASH_SIZE * 8))
+    assignee_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_repair_request_archive_created', 'created_at', 'id'),
+        db.Index('ix_repair_request_archive_user_created', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedRepairRequest {self.id} - {self.computer_number}>'
+
+class RequestWatcher(db.Model):
+    """Пользователь, присоединившийся к заявке вместо создания дубликата"""
+    request_id = db.Column(db.Integer, primary_key=True)  # Без внешнего ключа: заявка может уйти в архив
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StatusTransition(db.Model):
+    """Переход заявки в новый статус. Записи только добавляются"""
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, nullable=False)  # Без внешнего ключа: заявка может уйти в архив
+    from_status = db.Column(db.String(20))  # None - создание заявки
+    to_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # None - импорт или восстановленная история
+
+    __table_args__ = (
+        db.Index('ix_status_transition_request', 'request_id', 'changed_at'),
+    )
+
+    def __repr__(self):
+        return f'<StatusTransition {self.request_id}: {self.from_status} -> {self.to_status}>'
+
+class StatusRollup(db.Model):
+    """Дневные итоги по (день, аудитория, приоритет).
+
+    created/started/completed - сколько заявок создано, впервые взято в работу
+    и впервые завершено за день. in_progress_<i> и completed_<i> - гистограмма
+    времени от создания до этих статусов: i - индекс интервала в
+    RESOLUTION_BUCKETS. Гистограммы складываются, поэтому перцентили за любой
+    период считаются по итогам без истории.
+    """
+    day = db.Column(db.Date, primary_key=True)
+    location = db.Column(db.String(100), primary_key=True)
+    priority = db.Column(db.String(20), primary_key=True)
+    created = db.Column(db.Integer, nullable=False, default=0)
+    started = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+# Столбцы гистограмм: по одному на интервал, чтобы день занимал одну строку
+ROLLUP_HISTOGRAMS = {metric: [f'{metric}_{bucket}' for bucket in range(len(RESOLUTION_BUCKETS) + 1)]
+                     for metric in ('in_progress', 'completed')}
+ROLLUP_COUNTS = ['created', 'started', 'completed'] + sum(ROLLUP_HISTOGRAMS.values(), [])
+for _column in sum(ROLLUP_HISTOGRAMS.values(), []):
+    setattr(StatusRollup, _column, db.Column(db.Integer, nullable=False, default=0))
+
+class Job(db.Model):
+    """Фоновая задача в очереди (queued -> running -> done / failed).
+
+    Для running-задачи run_after - срок аренды: если процесс упал, по его
+    истечении задачу заберет другой обработчик.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    idempotency_key = db.Column(db.String(200), unique=True)  # Повторная постановка с тем же ключом игнорируется
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} - {self.status}>'
+
+# Фильтрация и постраничный вывод заявок
+def request_list_query(include_archived=False):
+    """Заявки вместе с именем автора одним JOIN-запросом.
+
+    Загружаются только столбцы, которые выводятся в списках, поэтому
+    обращение к автору не порождает отдельный SELECT на каждую строку.
+    С include_archived к рабочей таблице через UNION ALL добавляется архив;
+    фильтры по столбцам RepairRequest применяются к обеим частям.
+    """
+    def list_query(model):
+        return db.session.query(
+            model.id,
+            model.user_id,
+            model.computer_number,
+            model.location,
+            model.problem_description,
+            model.status,
+            model.priority,
+            model.created_at,
+            model.updated_at,
+            model.assignee_id,
+            User.full_name.label('author_name'),
+            db.literal(model is ArchivedRepairRequest).label('archived')
+        ).join(User, model.user_id == User.id)
+    
+    query = list_query(RepairRequest)
+    if include_archived:
+        query = query.union_all(list_query(ArchivedRepairRequest))
+    return query
+
+def parse_date(value):
+    """Разбор даты ГГГГ-ММ-ДД, None если значение пустое или неверное"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def get_request_filters(args):
+    """Допустимые фильтры списка заявок из параметров запроса"""
+    filters = {}
+    if args.get('status') in REQUEST_STATUSES:
+        filters['status'] = args['status']
+    if args.get('priority') in REQUEST_PRIORITIES:
+        filters['priority'] = args['priority']
+    if args.get('location', '').strip():
+        filters['location'] = args['location'].strip()
+    for key in ('date_from', 'date_to'):
+        if parse_date(args.get(key)):
+            filters[key] = args[key]
+    if args.get('archived') == '1':
+        filters['archived'] = '1'
+    return filters
+
+def apply_request_filters(query, filters):
+    """Применение фильтров к запросу заявок на стороне БД"""
+    if 'status' in filters:
+        query = query.filter(RepairRequest.status == filters['status'])
+    if 'priority' in filters:
+        query = query.filter(RepairRequest.priority == filters['priority'])
+    if 'location' in filters:
+        query = query.filter(RepairRequest.location == filters['location'])
+    if 'date_from' in filters:
+        query = query.filter(RepairRequest.created_at >= parse_date(filters['date_from']))
+    if 'date_to' in filters:
+        # Дата "по" включительно - до начала следующего дня
+        query = query.filter(RepairRequest.created_at < parse_date(filters['date_to']) + timedelta(days=1))
+    return query
+
+def encode_cursor(repair_request, field='created_at'):
+    """Курсор страницы - пара (created_at, id) последней показанной заявки"""
+    return f"{getattr(repair_request, field).strftime('%Y%m%d%H%M%S%f')}-{repair_request.id}"
+
+def decode_cursor(value):
+    """Разбор курсора, None если курсор не передан или поврежден"""
+    try:
+        stamp, request_id = value.split('-')
+        return datetime.strptime(stamp, '%Y%m%d%H%M%S%f'), int(request_id)
+    except (AttributeError, ValueError):
+        return None
+
+def get_page_size(args):
+    """Размер страницы из параметра limit в допустимых пределах"""
+    limit = args.get('limit', type=int) or app.config['REQUESTS_PAGE_SIZE']
+    return max(1, min(limit, app.config['REQUESTS_PAGE_SIZE_MAX']))
+
+def paginate_requests(query, cursor, limit):
+    """Keyset-пагинация по (created_at, id) от новых к старым.
+
+    Возвращает заявки страницы и курсор следующей страницы (или None).
+    """
+    position = decode_cursor(cursor)
+    if position:
+        created_at, request_id = position
+        query = query.filter(db.or_(
+            RepairRequest.created_at < created_at,
+            db.and_(RepairRequest.created_at == created_at, RepairRequest.id < request_id)
+        ))
+    
+    page = query.order_by(RepairRequest.created_at.desc(), RepairRequest.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+def visible_to_user(user_id):
+    """Условие для заявок пользователя: свои и те, к которым он присоединился"""
+    return db.or_(RepairRequest.user_id == user_id, RepairRequest.id.in_(
+        db.select(RequestWatcher.request_id).where(RequestWatcher.user_id == user_id)))
+
+# Поиск дублей при создании заявки
+# Кандидаты - открытые заявки того же компьютера (по индексу computer_key), среди
+# них описания сравниваются по MinHash-подписям, посчитанным при создании заявок.
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_COEFFICIENTS = [(rng.randrange(1, MINHASH_PRIME), rng.randrange(MINHASH_PRIME))
+                        for rng in [random.Random(MINHASH_SIZE)] for _ in range(MINHASH_SIZE)]
+
+def normalize_computer_number(value):
+    """pc-101, PC 101 и PC101 дают один ключ"""
+    return ''.join(char for char in value.upper() if char.isalnum())[:20]
+
+@lru_cache(maxsize=4096)
+def description_signature(text):
+    """MinHash по 4-граммам символов нормализованного описания"""
+    words = ' '.join(re.findall(r'\w+', text.lower()))
+    shingles = {words[i:i + 4] for i in range(max(len(words) - 3, 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big') for shingle in shingles]
+    signature = [min((a * value + b) % MINHASH_PRIME for value in hashes) & 0xffffffff
+                 for a, b in MINHASH_COEFFICIENTS]
+    return struct.pack(f'>{MINHASH_SIZE}I', *signature).hex()
+
+def signature_values(signature):
+    """Значения подписи для сравнения (без копирования и разбора строк)"""
+    return memoryview(bytes.fromhex(signature)).cast('I')
+
+def signature_similarity(first, second):
+    """Оценка сходства Жаккара: доля совпавших значений подписей (из signature_values)"""
+    return sum(map(operator.eq, first, second)) / MINHASH_SIZE
+
+def duplicate_fields(computer_number, problem_description):
+    return {'computer_key': normalize_computer_number(computer_number),
+            'description_signature': description_signature(problem_description)}
+
+def find_duplicates(fields, limit=3):
+    """Открытые заявки того же компьютера с похожим описанием: [(заявка, сходство)]"""
+    table = RepairRequest.__table__
+    # Сначала только подписи кандидатов, полные строки - лишь для найденных дублей
+    candidates = db.session.execute(
+        db.select(table.c.id, table.c.description_signature)
+        .where(table.c.computer_key == fields['computer_key'], table.c.status != 'completed')
+        .order_by(table.c.created_at.desc()).limit(app.config['DUPLICATE_CANDIDATES'])
+    ).all()
+    target = signature_values(fields['description_signature'])
+    scores = {}
+    for request_id, signature in candidates:
+        score = signature_similarity(target, signature_values(signature)) if signature else 0.0
+        if score >= app.config['DUPLICATE_THRESHOLD']:
+            scores[request_id] = score
+    if not scores:
+        return []
+    
+    best = sorted(scores, key=scores.get, reverse=True)[:limit]
+    rows = {row.id: row for row in request_list_query().filter(RepairRequest.id.in_(best))}
+    return [(rows[request_id], scores[request_id]) for request_id in best if request_id in rows]
+
+def backfill_duplicate_keys(batch_size=1000):
+    """Ключи и подписи для заявок, созданных до поиска дублей или импортированных"""
+    table = RepairRequest.__table__
+    updated = 0
+    while True:
+        batch = db.session.execute(
+            db.select(table.c.id, table.c.computer_number, table.c.problem_description)
+            .where(table.c.computer_key.is_(None)).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        # updated_at сохраняется: иначе onupdate сдвинул бы его у всех старых заявок
+        # (архивация, версии для пакетной смены статусов, лента изменений)
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('request_id'))
+            .values(computer_key=db.bindparam('key'), description_signature=db.bindparam('signature'),
+                    updated_at=table.c.updated_at),
+            [{'request_id': row.id, 'key': normalize_computer_number(row.computer_number),
+              'signature': description_signature(row.problem_description)} for row in batch]
+        )
+        db.session.commit()
+        updated += len(batch)
+    return updated
+
+# Статистика заявок
+def dialect_insert(table):
+    """INSERT текущей СУБД с поддержкой ON CONFLICT (PostgreSQL и SQLite)"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def increment_row(table, keys, deltas):
+    """Прибавление deltas к строке с ключом keys или ее создание (в текущей транзакции).
+
+    Один INSERT ... ON CONFLICT DO UPDATE: две транзакции, создающие одну
+    и ту же новую строку, не получают IntegrityError.
+    """
+    insert = dialect_insert(table).values(**keys, **deltas)
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + insert.excluded[name] for name in deltas}
+    ))
+
+def bump_request_counter(status, priority, location, delta):
+    """Изменение счетчика заявок в текущей транзакции (коммит - у вызывающего)"""
+    increment_row(RequestCounter.__table__, {'status': status, 'priority': priority, 'location': location},
+                  {'count': delta})
+
+def rebuild_request_counters():
+    """Пересчет счетчиков одним GROUP BY по заявкам, включая архив"""
+    counter = RequestCounter.__table__
+    requests = db.union_all(*[
+        db.select(model.status, model.priority, model.location) for model in (RepairRequest, ArchivedRepairRequest)
+    ]).subquery()
+    grouped = db.select(
+        requests.c.status, requests.c.priority, requests.c.location, db.func.count()
+    ).group_by(requests.c.status, requests.c.priority, requests.c.location)
+    
+    db.session.execute(counter.delete())
+    db.session.execute(counter.insert().from_select(['status', 'priority', 'location', 'count'], grouped))
+    db.session.commit()
+
+def get_request_stats():
+    """Статистика для главной панели: итоги по статусам и разбивки по приоритету и аудитории"""
+    def empty():
+        return dict.fromkeys(('total',) + REQUEST_STATUSES, 0)
+    
+    stats = empty()
+    by_priority = {}
+    by_location = {}
+    for counter in RequestCounter.query.filter(RequestCounter.count > 0):
+        for bucket in (stats, by_priority.setdefault(counter.priority, empty()),
+                       by_location.setdefault(counter.location, empty())):
+            bucket['total'] += counter.count
+            bucket[counter.status] = bucket.get(counter.status, 0) + counter.count
+    
+    stats['by_priority'] = [(priority, by_priority[priority]) for priority in reversed(REQUEST_PRIORITIES) if priority in by_priority]
+    # Сначала аудитории с наибольшим числом незавершенных заявок
+    stats['by_location'] = sorted(by_location.items(), key=lambda item: item[1]['total'] - item[1]['completed'], reverse=True)
+    return stats
+
+# История статусов и отчеты о времени ремонта
+# Каждый переход пишется в status_transition, а в той же транзакции обновляются
+# дневные итоги. Отчеты читают только итоги, а не историю.
+REPORT_GROUPS = ('location', 'priority', 'day', 'week')
+
+def rollup_change(totals, day, location, priority, from_status, to_status, elapsed, first):
+    """Вклад одного перехода в дневные итоги (first - заявка впервые достигла статуса)"""
+    counts = totals.setdefault((day, location, priority), dict.fromkeys(ROLLUP_COUNTS, 0))
+    if from_status is None:
+        counts['created'] += 1
+    if first and to_status in ROLLUP_HISTOGRAMS:
+        counts['started' if to_status == 'in_progress' else 'completed'] += 1
+        bucket = bisect.bisect_left(RESOLUTION_BUCKETS, max(elapsed.total_seconds(), 0))
+        counts[ROLLUP_HISTOGRAMS[to_status][bucket]] += 1
+
+def record_status_changes(changes, user_id=None):
+    """Запись переходов [(заявка, старый статус, новый статус)] и обновление итогов.
+
+    У заявки нужны id, location, priority и created_at; коммит - у вызывающего.
+    """
+    if not changes:
+        return
+    transitions = StatusTransition.__table__
+    now = datetime.utcnow()
+    # Время до статуса считается по первому достижению: повторное открытие не искажает отчет
+    reached = set(db.session.execute(
+        db.select(transitions.c.request_id, transitions.c.to_status)
+        .where(transitions.c.request_id.in_([req.id for req, _, _ in changes]),
+               transitions.c.to_status.in_(list(ROLLUP_HISTOGRAMS)))
+    ).all())
+    
+    rows = []
+    totals = {}
+    for req, from_status, to_status in changes:
+        changed_at = req.created_at if from_status is None else now
+        rows.append({'request_id': req.id, 'from_status': from_status, 'to_status': to_status,
+                     'changed_at': changed_at, 'user_id': user_id})
+        rollup_change(totals, changed_at.date(), req.location, req.priority, from_status, to_status,
+                      changed_at - req.created_at, (req.id, to_status) not in reached)
+        reached.add((req.id, to_status))
+    db.session.execute(transitions.insert(), rows)
+    
+    for (day, location, priority), counts in totals.items():
+        deltas = {name: value for name, value in counts.items() if value}
+        if deltas:
+            increment_row(StatusRollup.__table__, {'day': day, 'location': location, 'priority': priority}, deltas)
+
+def rebuild_status_rollups(batch_size=10000):
+    """Пересчет дневных итогов по всей истории переходов"""
+    transitions = StatusTransition.__table__
+    requests = db.union_all(*[
+        db.select(model.id, model.location, model.priority, model.created_at)
+        for model in (RepairRequest, ArchivedRepairRequest)
+    ]).subquery()
+    history = db.select(
+        transitions.c.request_id, transitions.c.from_status, transitions.c.to_status, transitions.c.changed_at,
+        requests.c.location, requests.c.priority, requests.c.created_at
+    ).join(requests, requests.c.id == transitions.c.request_id).order_by(
+        transitions.c.request_id, transitions.c.changed_at, transitions.c.id)
+    
+    totals = {}
+    reached = set()
+    current_request = None
+    for row in db.session.execute(history.execution_options(yield_per=batch_size)):
+        if row.request_id != current_request:
+            current_request, reached = row.request_id, set()
+        rollup_change(totals, row.changed_at.date(), row.location, row.priority, row.from_status,
+                      row.to_status, row.changed_at - row.created_at, row.to_status not in reached)
+        reached.add(row.to_status)
+    
+    db.session.execute(StatusRollup.__table__.delete())
+    if totals:
+        db.session.execute(StatusRollup.__table__.insert(), [
+            {'day': day, 'location': location, 'priority': priority, **counts}
+            for (day, location, priority), counts in totals.items()])
+    db.session.commit()
+
+def backfill_status_history():
+    """История для заявок без переходов (созданных до журнала или импортированных).
+
+    Пишутся создание в created_at и переход в текущий статус в updated_at;
+    если что-то добавлено, итоги пересчитываются. Возвращает число заявок.
+    """
+    transitions = StatusTransition.__table__
+    columns = ['request_id', 'from_status', 'to_status', 'changed_at']
+    no_history = ~db.exists().where(transitions.c.request_id == RepairRequest.id)
+    no_changes = ~db.exists().where(transitions.c.request_id == RepairRequest.id, transitions.c.from_status.isnot(None))
+    
+    created = db.session.execute(transitions.insert().from_select(columns, db.select(
+        RepairRequest.id, db.null(), db.literal('pending'), RepairRequest.created_at
+    ).where(no_history))).rowcount
+    if created:
+        db.session.execute(transitions.insert().from_select(columns, db.select(
+            RepairRequest.id, db.literal('pending'), RepairRequest.status,
+            db.func.coalesce(RepairRequest.updated_at, RepairRequest.created_at)
+        ).where(RepairRequest.status != 'pending', no_changes)))
+        rebuild_status_rollups()
+    else:
+        db.session.commit()
+    return created
+
+def bucket_percentile(counts, fraction):
+    """Перцентиль по гистограмме (линейно внутри интервала), None если данных нет"""
+    total = sum(counts)
+    if not total:
+        return None
+    target = fraction * total
+    cumulative = 0
+    for bucket, count in enumerate(counts):
+        if count and cumulative + count >= target:
+            lower = RESOLUTION_BUCKETS[bucket - 1] if bucket else 0
+            if bucket == len(RESOLUTION_BUCKETS):
+                return lower
+            return lower + (RESOLUTION_BUCKETS[bucket] - lower) * (target - cumulative) / count
+        cumulative += count
+
+def get_resolution_report(date_from, date_to, group):
+    """Отчет по дневным итогам: число заявок и p50/p90 времени до работы и до завершения (ч)"""
+    key_column = StatusRollup.day if group in ('day', 'week') else getattr(StatusRollup, group)
+    rows = {}
+    for key, *sums in db.session.query(
+            key_column, *[db.func.sum(getattr(StatusRollup, name)) for name in ROLLUP_COUNTS]
+    ).filter(StatusRollup.day >= date_from, StatusRollup.day <= date_to).group_by(key_column):
+        if group == 'week':
+            key = (key - timedelta(days=key.weekday())).isoformat()
+        elif group == 'day':
+            key = key.isoformat()
+        counts = rows.setdefault(key, dict.fromkeys(ROLLUP_COUNTS, 0))
+        for name, value in zip(ROLLUP_COUNTS, sums):
+            counts[name] += value
+    
+    def hours(counts, metric, fraction):
+        seconds = bucket_percentile([counts[name] for name in ROLLUP_HISTOGRAMS[metric]], fraction)
+        return round(seconds / 3600, 2) if seconds is not None else None
+    
+    return [{
+        group: key,
+        'created': counts['created'],
+        'started': counts['started'],
+        'completed': counts['completed'],
+        'hours_to_in_progress': {'p50': hours(counts, 'in_progress', 0.5), 'p90': hours(counts, 'in_progress', 0.9)},
+        'hours_to_completed': {'p50': hours(counts, 'completed', 0.5), 'p90': hours(counts, 'completed', 0.9)}
+    } for key, counts in sorted(rows.items())]
+
+# Архив завершенных заявок
+# Старые завершенные заявки переносятся в repair_request_archive, чтобы рабочая
+# таблица и ее индексы росли с числом активных заявок, а не со всей историей.
+def archive_completed_requests(older_than_days=None, batch_size=None):
+    """Перенос завершенных заявок без изменений дольше older_than_days дней в архив.
+
+    Каждая пачка - отдельная короткая транзакция (DELETE ... RETURNING из рабочей
+    таблицы и INSERT в архив), поэтому запись не блокируется надолго.
+    Возвращает число перенесенных заявок.
+    """
+    days = app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    hot, archive = RepairRequest.__table__, ArchivedRepairRequest.__table__
+    archivable = db.and_(hot.c.status == 'completed', hot.c.updated_at < cutoff)
+    
+    moved = 0
+    while True:
+        # Условие проверяется в самом DELETE: заявку, которую открыли заново
+        # после выбора пачки, он не удаляет и в архив она не попадает
+        batch = db.select(hot.c.id).where(archivable).order_by(hot.c.created_at).limit(batch_size)
+        rows = db.session.execute(
+            hot.delete().where(hot.c.id.in_(batch.scalar_subquery()), archivable).returning(*hot.columns)
+        ).all()
+        if not rows:
+            db.session.rollback()
+            break
+        archived_at = datetime.utcnow()
+        db.session.execute(archive.insert(), [dict(row._mapping, archived_at=archived_at) for row in rows])
+        db.session.commit()
+        moved += len(rows)
+        time.sleep(app.config['ARCHIVE_BATCH_PAUSE'])
+    return moved
+
+# Полнотекстовый поиск по заявкам
+# В SQLite - внешний FTS5-индекс по таблице заявок, синхронизируемый триггерами,
+# в остальных СУБД (PostgreSQL) - поиск через ILIKE
+SEARCH_FTS_STATEMENTS = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS repair_request_fts USING fts5(
+        problem_description, location, computer_number,
+        content='repair_request', content_rowid='id', tokenize='unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS repair_request_fts_insert AFTER INSERT ON repair_request BEGIN
+        INSERT INTO repair_request_fts(rowid, problem_description, location, computer_number)
+        VALUES (new.id, new.problem_description, new.location, new.computer_number);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS repair_request_fts_delete AFTER DELETE ON repair_request BEGIN
+        INSERT INTO repair_request_fts(repair_request_fts, rowid, problem_description, location, computer_number)
+        VALUES ('delete', old.id, old.problem_description, old.location, old.computer_number);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS repair_request_fts_update
+    AFTER UPDATE OF problem_description, location, computer_number ON repair_request BEGIN
+        INSERT INTO repair_request_fts(repair_request_fts, rowid, problem_description, location, computer_number)
+        VALUES ('delete', old.id, old.problem_description, old.location, old.computer_number);
+        INSERT INTO repair_request_fts(rowid, problem_description, location, computer_number)
+        VALUES (new.id, new.problem_description, new.location, new.computer_number);
+    END""",
+)
+
+# Маркеры подсветки в snippet(): не встречаются в тексте и заменяются после экранирования
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+_search_backend = None
+
+def ensure_search_index():
+    """Создание FTS5-индекса и триггеров; при первом создании индекс заполняется"""
+    global _search_backend
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    
+    with db.engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'repair_request_fts'").first()
+        try:
+            for statement in SEARCH_FTS_STATEMENTS:
+                connection.exec_driver_sql(statement)
+        except db.exc.OperationalError as e:
+            # SQLite собран без FTS5 - остается поиск через LIKE
+            app.logger.warning('FTS5 недоступен: %s', e)
+            return False
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO repair_request_fts(repair_request_fts) VALUES ('rebuild')")
+    
+    _search_backend = 'fts5'
+    return True
+
+def search_backend():
+    """'fts5', если индекс поиска создан, иначе 'like' (проверяется один раз на процесс)"""
+    global _search_backend
+    if _search_backend is None:
+        _search_backend = 'like'
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as connection:
+                if connection.exec_driver_sql(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'repair_request_fts'").first():
+                    _search_backend = 'fts5'
+    return _search_backend
+
+def fts_query(text):
+    """Запрос FTS5 из строки пользователя: каждое слово - фраза с поиском по префиксу.
+
+    "PC-205" превращается в фразу "pc 205"*, слова объединяются через AND.
+    """
+    phrases = []
+    for term in text.split():
+        tokens = re.findall(r'\w+', term)
+        if tokens:
+            phrases.append('"' + ' '.join(tokens) + '"*')
+    return ' '.join(phrases)
+
+def highlight(text):
+    """Экранирование фрагмента и замена маркеров подсветки на <mark>"""
+    return Markup(str(escape(text)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+def like_snippet(text, terms, width=60):
+    """Фрагмент описания вокруг первого совпадения для поиска без FTS5"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - width) if match else 0
+    fragment = text[start:start + 2 * width]
+    fragment = pattern.sub(lambda m: HIGHLIGHT_START + m.group(0) + HIGHLIGHT_END, fragment)
+    return ('…' if start else '') + fragment + ('…' if start + 2 * width < len(text) else '')
+
+def search_requests(text, user_id=None, page=1, per_page=20, backend=None, include_archived=False):
+    """Поиск заявок по описанию, аудитории и номеру компьютера.
+
+    Возвращает строки страницы (с подсвеченным фрагментом snippet) и
+    признак следующей страницы. user_id ограничивает поиск заявками, которые
+    пользователь видит в списках (visible_to_user). FTS-индекс есть только у
+    рабочей таблицы, поэтому с include_archived поиск идет через LIKE по
+    рабочей таблице и архиву вместе.
+    """
+    backend = 'like' if include_archived else backend or search_backend()
+    offset = (page - 1) * per_page
+    
+    if backend == 'fts5':
+        match = fts_query(text)
+        if not match:
+            return [], False
+        # То же условие видимости, что и в списках заявок (свои и присоединенные)
+        scope = 'AND ({})'.format(visible_to_user(int(user_id)).compile(
+            db.engine, compile_kwargs={'literal_binds': True})) if user_id else ''
+        sql = """
+            SELECT repair_request.id, repair_request.computer_number, repair_request.location,
+                   repair_request.status, repair_request.priority, repair_request.created_at,
+                   u.full_name AS author_name, 0 AS archived,
+                   snippet(repair_request_fts, 0, :start, :end, '…', 12) AS snippet
+            FROM repair_request_fts
+            JOIN repair_request ON repair_request.id = repair_request_fts.rowid
+            JOIN user u ON u.id = repair_request.user_id
+            WHERE repair_request_fts MATCH :match {scope}
+            ORDER BY bm25(repair_request_fts)
+            LIMIT :limit OFFSET :offset
+        """.format(scope=scope)
+        rows = db.session.execute(db.text(sql).columns(created_at=db.DateTime), {
+            'match': match, 'start': HIGHLIGHT_START, 'end': HIGHLIGHT_END,
+            'limit': per_page + 1, 'offset': offset
+        }).mappings().all()
+        results = [dict(row, snippet=highlight(row['snippet'])) for row in rows]
+    else:
+        terms = text.split()
+        if not terms:
+            return [], False
+        query = request_list_query(include_archived=include_archived)
+        for term in terms:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            query = query.filter(db.or_(
+                RepairRequest.problem_description.ilike(pattern, escape='\\'),
+                RepairRequest.location.ilike(pattern, escape='\\'),
+                RepairRequest.computer_number.ilike(pattern, escape='\\')
+            ))
+        if user_id:
+            query = query.filter(visible_to_user(user_id))
+        rows = query.order_by(RepairRequest.created_at.desc()).limit(per_page + 1).offset(offset).all()
+        results = [dict(row._mapping, snippet=highlight(like_snippet(row.problem_description, terms)))
+                   for row in rows]
+    
+    return results[:per_page], len(results) > per_page
+
+# События об изменениях заявок (SSE)
+class EventBroker:
+    """Рассылка событий подписчикам внутри процесса.
+
+    У каждого подписчика своя ограниченная очередь: если клиент не
+    успевает читать, очередь очищается и ему отправляется событие
+    resync - клиент перезагружает страницу целиком. Подписчиков не больше
+    max_subscribers: subscribe() сверх лимита возвращает None.
+    """
+    
+    def __init__(self, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.lock = threading.Lock()
+    
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+    
+    def deliver(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': 'resync'})
+    
+    def publish(self, event):
+        self.deliver(event)
+
+class PostgresEventBroker(EventBroker):
+    """Брокер, рассылающий события всем процессам через LISTEN/NOTIFY PostgreSQL.
+
+    Событие отправляется через NOTIFY, а поток-слушатель в каждом процессе
+    (включая отправивший) доставляет его локальным подписчикам.
+    """
+    
+    CHANNEL = 'repair_request_events'
+    
+    def __init__(self, queue_size, max_subscribers, dsn):
+        super().__init__(queue_size, max_subscribers)
+        self.dsn = dsn
+        self.publish_connection = None
+        self.publish_lock = threading.Lock()
+        self.listener = None
+    
+    def connect(self):
+        import psycopg2
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+    
+    def subscribe(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='event-listener', daemon=True)
+                self.listener.start()
+        return super().subscribe()
+    
+    def listen(self):
+        import select
+        while True:
+            try:
+                connection = self.connect()
+                connection.cursor().execute(f'LISTEN {self.CHANNEL}')
+                while True:
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.deliver(json.loads(connection.notifies.pop(0).payload))
+            except Exception as e:
+                app.logger.warning('Слушатель событий отключен: %s', e)
+                time.sleep(5)
+    
+    def publish(self, event):
+        with self.publish_lock:
+            try:
+                if self.publish_connection is None or self.publish_connection.closed:
+                    self.publish_connection = self.connect()
+                self.publish_connection.cursor().execute(
+                    'SELECT pg_notify(%s, %s)', (self.CHANNEL, json.dumps(event, ensure_ascii=False)))
+            except Exception as e:
+                # Событие не критично: клиенты догонят состояние при следующей загрузке
+                app.logger.warning('Не удалось отправить событие: %s', e)
+                self.publish_connection = None
+
+if app.config['EVENTS_BROKER_URL']:
+    event_broker = PostgresEventBroker(app.config['EVENTS_QUEUE_SIZE'], app.config['EVENTS_MAX_SUBSCRIBERS'],
+                                       app.config['EVENTS_BROKER_URL'])
+else:
+    event_broker = EventBroker(app.config['EVENTS_QUEUE_SIZE'], app.config['EVENTS_MAX_SUBSCRIBERS'])
+
+def task_card_data(repair_request, author_name):
+    """Данные карточки заявки для updateTaskCard (события и захват заявки)"""
+    return {
+        'id': repair_request.id,
+        'computer_number': repair_request.computer_number,
+        'location': repair_request.location,
+        # NOTIFY ограничивает размер сообщения, полный текст есть на странице заявки
+        'problem_description': repair_request.problem_description[:500],
+        'status': repair_request.status,
+        'priority': repair_request.priority,
+        'created_at': repair_request.created_at.strftime('%d.%m.%Y %H:%M'),
+        'author': author_name
+    }
+
+def publish_request_event(event_type, repair_request, author_name):
+    """Событие о заявке для экранов специалистов (после коммита)"""
+    event_broker.publish({'type': event_type, 'request': task_card_data(repair_request, author_name)})
+
+# Фоновые задачи
+# Обработчики записи только ставят задачи в таблицу job в своей транзакции,
+# а выполняют их потоки JobWorker или команда flask jobs-drain.
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Регистрация обработчика задач вида kind"""
+    def decorator(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return decorator
+
+def enqueue_jobs(kind, items):
+    """Постановка задач [(payload, idempotency_key), ...] в текущей транзакции (коммит - у вызывающего)"""
+    if not items:
+        return
+    now = datetime.utcnow()
+    db.session.execute(
+        dialect_insert(Job.__table__).on_conflict_do_nothing(index_elements=['idempotency_key']),
+        [{'kind': kind, 'payload': json.dumps(payload, ensure_ascii=False), 'idempotency_key': key,
+          'status': 'queued', 'attempts': 0, 'run_after': now, 'created_at': now, 'updated_at': now}
+         for payload, key in items]
+    )
+    db.session.info['jobs_enqueued'] = True
+
+def enqueue_job(kind, payload, idempotency_key=None):
+    enqueue_jobs(kind, [(payload, idempotency_key)])
+
+def claim_job():
+    """Захват готовой задачи: UPDATE с проверкой статуса и срока, выигрывает один обработчик.
+
+    Задача с истекшей арендой, у которой попытки кончились (обработчик падал вместе
+    с процессом), больше не выдается, а помечается failed.
+    """
+    table = Job.__table__
+    now = datetime.utcnow()
+    max_attempts = app.config['JOBS_MAX_ATTEMPTS']
+    ready = db.and_(table.c.status.in_(('queued', 'running')), table.c.run_after <= now)
+    claimable = db.and_(ready, db.or_(table.c.status == 'queued', table.c.attempts < max_attempts))
+    exhausted = db.and_(ready, table.c.status == 'running', table.c.attempts >= max_attempts)
+    candidates = db.session.execute(
+        db.select(table.c.id).where(ready).order_by(table.c.run_after).limit(5)
+    ).scalars().all()
+    end_read_transaction()
+    for job_id in candidates:
+        claimed = db.session.execute(
+            table.update().where(table.c.id == job_id, claimable)
+            .values(status='running', attempts=table.c.attempts + 1,
+                    run_after=now + timedelta(seconds=app.config['JOBS_LEASE']), updated_at=now)
+        )
+        if claimed.rowcount != 1:
+            failed = db.session.execute(
+                table.update().where(table.c.id == job_id, exhausted)
+                .values(status='failed', last_error='Аренда истекла: обработчик завершился, не закончив задачу',
+                        updated_at=now)
+            )
+            if failed.rowcount == 1:
+                app.logger.error('Задача %s не выполнена: аренда истекла после %s попыток', job_id, max_attempts)
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return db.session.get(Job, job_id)
+    return None
+
+def run_next_job():
+    """Выполнение одной задачи. False - готовых задач нет"""
+    job = claim_job()
+    if job is None:
+        return False
+    job_id, handler = job.id, JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'нет обработчика задач {job.kind}')
+        handler(json.loads(job.payload))
+    except Exception as error:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = f'{type(error).__name__}: {error}'
+        if handler is None or job.attempts >= app.config['JOBS_MAX_ATTEMPTS']:
+            job.status = 'failed'
+            app.logger.error('Задача %s (%s) не выполнена: %s', job.id, job.kind, job.last_error)
+        else:
+            # Экспоненциальная задержка со случайной добавкой, чтобы повторы не шли пачкой
+            delay = app.config['JOBS_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay + random.uniform(0, delay))
+            app.logger.warning('Задача %s (%s), попытка %s: %s', job.id, job.kind, job.attempts, job.last_error)
+    else:
+        job.status = 'done'
+        job.last_error = None
+    db.session.commit()
+    return True
+
+class JobWorker:
+    """Потоки процесса, выполняющие задачи из очереди"""
+    
+    def __init__(self):
+        self.wakeup = threading.Event()
+        self.threads = []
+    
+    def start(self, count):
+        for number in range(count):
+            thread = threading.Thread(target=self.run, name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def wake(self):
+        self.wakeup.set()
+    
+    def run(self):
+        while True:
+            self.wakeup.clear()
+            with app.app_context():
+                try:
+                    ran = run_next_job()
+                except Exception:
+                    app.logger.exception('Ошибка очереди фоновых задач')
+                    ran = False
+            if not ran:
+                self.wakeup.wait(app.config['JOBS_POLL_INTERVAL'])
+
+job_worker = JobWorker()
+
+@db.event.listens_for(RoutingSession, 'after_commit')
+def wake_job_worker(session):
+    if session.info.pop('jobs_enqueued', False):
+        job_worker.wake()
+
+@db.event.listens_for(RoutingSession, 'after_rollback')
+def forget_enqueued_jobs(session):
+    session.info.pop('jobs_enqueued', None)
+
+def notify_author_later(repair_request, event_type):
+    """Уведомление автора заявки через очередь (ключ исключает повтор для того же изменения)"""
+    version = repair_request.updated_at.isoformat() if repair_request.updated_at else ''
+    enqueue_job('notify_author', {'request_id': repair_request.id, 'event': event_type},
+                f'notify_author:{repair_request.id}:{event_type}:{repair_request.status}:{version}')
+
+@job_handler('notify_author')
+def notify_author(payload):
+    """Уведомление автора (и присоединившихся) о создании заявки или смене ее статуса"""
+    repair_request = db.session.get(RepairRequest, payload['request_id'])
+    if repair_request is None:
+        return
+    recipients = [repair_request.author.username] + [username for username, in db.session.query(User.username).join(
+        RequestWatcher, RequestWatcher.user_id == User.id).filter(RequestWatcher.request_id == repair_request.id)]
+    # Канала доставки (почты) у пользователей пока нет - уведомление пишется в журнал
+    for username in recipients:
+        app.logger.info('Уведомление для %s: заявка #%s (%s) - %s', username,
+                        repair_request.id, repair_request.computer_number, repair_request.status)
+
+# Пароли
+# Хэш хранится в виде pbkdf2_sha256$<итерации>$<соль>$<хэш>. Старые записи с
+# паролем в открытом виде проверяются напрямую и перехэшируются при входе.
+PASSWORD_HASH_PREFIX = 'pbkdf2_sha256'
+
+class PasswordPoolBusy(Exception):
+    """Пул проверки паролей перегружен"""
+
+# Хэширование занимает процессор (hashlib отпускает GIL), поэтому выполняется
+# в ограниченном пуле: всплеск входов не отнимает все ядра у остальных запросов
+_password_pool = ThreadPoolExecutor(max_workers=app.config['PASSWORD_POOL_SIZE'], thread_name_prefix='password')
+_password_slots = threading.BoundedSemaphore(app.config['PASSWORD_POOL_SIZE'] * 4)
+
+def hash_password(password, iterations=None):
+    iterations = iterations or app.config['PASSWORD_HASH_ITERATIONS']
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return '$'.join((PASSWORD_HASH_PREFIX, str(iterations),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()))
+
+def check_password(stored, password):
+    """Проверка пароля: (подходит ли, нужно ли пересчитать хэш)"""
+    parts = stored.split('$')
+    if len(parts) != 4 or parts[0] != PASSWORD_HASH_PREFIX:
+        # Пароль из старых записей в открытом виде
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    
+    iterations = int(parts[1])
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), base64.b64decode(parts[2]), iterations)
+    matches = hmac.compare_digest(digest, base64.b64decode(parts[3]))
+    return matches, iterations < app.config['PASSWORD_HASH_ITERATIONS']
+
+def run_in_password_pool(function, *args):
+    """Выполнение в пуле паролей; PasswordPoolBusy, если очередь не освободилась вовремя"""
+    if not _password_slots.acquire(timeout=app.config['PASSWORD_POOL_TIMEOUT']):
+        raise PasswordPoolBusy()
+    try:
+        return _password_pool.submit(function, *args).result()
+    finally:
+        _password_slots.release()
+
+def hash_passwords(passwords):
+    """Хэширование нескольких паролей параллельно (импорт, тестовые пользователи)"""
+    return list(_password_pool.map(hash_password, passwords))
+
+@lru_cache(maxsize=None)
+def dummy_password_hash():
+    """Хэш для несуществующих пользователей, чтобы время ответа не выдавало имена.
+
+    Считается при первой проверке, а не при импорте: PBKDF2 не задерживает запуск.
+    """
+    return hash_password(secrets.token_hex(8))
+
+# Текущий пользователь
+# Снимок полей пользователя: не привязан к сессии БД, поэтому его можно
+# хранить между запросами
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'role', 'full_name'])
+
+_user_cache = {}  # user_id -> (истекает, CurrentUser)
+
+def load_user(user_id):
+    """Пользователь по id через кэш процесса с коротким TTL"""
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+    current = CurrentUser(user.id, user.username, user.role, user.full_name)
+    _user_cache[user_id] = (now + app.config['USER_CACHE_TTL'], current)
+    return current
+
+def invalidate_user_cache(user_id=None):
+    """Сброс кэша пользователей (одного или всех) после их изменения"""
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.pop(user_id, None)
+
+def get_current_user():
+    """Текущий пользователь: не больше одного обращения к БД за HTTP-запрос"""
+    if 'current_user' not in g:
+        g.current_user = load_user(session['user_id']) if 'user_id' in session else None
+    return g.current_user
+
 # Декоратор для проверки авторизации
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if get_current_user() is None:
+            # Нет входа или пользователь удален из базы
+            session.clear()
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -57,7 +1343,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user or user.role != 'admin':
             flash('Требуются права администратора', 'danger')
             return redirect(url_for('dashboard'))
@@ -70,7 +1356,7 @@ def technician_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user or user.role != 'technician':
             flash('Требуются права специалиста', 'danger')
             return redirect(url_for('dashboard'))
@@ -83,13 +1369,357 @@ def technician_or_admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user or user.role not in ['technician', 'admin']:
             flash('Требуются права специалиста или администратора', 'danger')
             return redirect(url_for('dashboard'))
         return f(*args, **kwargs)
     return decorated_function
 
+# Кэш фрагментов шаблонов
+class FragmentCache:
+    """LRU-кэш отрисованных строк таблиц и карточек заявок.
+
+    Ключ - (шаблон, id, updated_at, в архиве ли, имя автора, контекст): любое
+    изменение заявки меняет updated_at, а переименование автора - имя, поэтому
+    устаревшие фрагменты не выдаются, а просто вытесняются.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, template_name, items, **context):
+        # В ключе объект шаблона, а не имя: после автоперезагрузки шаблона старые фрагменты не подходят
+        template = app.jinja_env.get_template(template_name)
+        context_key = tuple(sorted(context.items()))
+        keys = [(template, item.id, item.updated_at, bool(item.archived), item.author_name, context_key) for item in items]
+        with self.lock:
+            parts = [self.entries.get(key) for key in keys]
+            for key, html in zip(keys, parts):
+                if html is not None:
+                    self.entries.move_to_end(key)
+            missing = parts.count(None)
+            self.hits += len(parts) - missing
+            self.misses += missing
+        
+        if missing:
+            rendered = {}
+            for index, item in enumerate(items):
+                if parts[index] is None:
+                    parts[index] = rendered[keys[index]] = template.render(req=item, **context)
+            if self.max_entries:
+                with self.lock:
+                    self.entries.update(rendered)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        return Markup(''.join(parts))
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+@app.template_global()
+def render_cached(template_name, items, **context):
+    """Строки для списка заявок: {{ render_cached('_request_row.html', requests, staff=True) }}"""
+    return fragment_cache.render(template_name, items, **context)
+
+if app.config['JINJA_BYTECODE_CACHE_DIR']:
+    # Скомпилированные шаблоны на диске: новый процесс не компилирует base.html и страницы заново
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
+# Статика и сжатие ответов
+# flask assets-build копирует статику в ASSETS_DIR с хэшем содержимого в имени
+# (css/style.css -> css/style.<хэш>.css) и готовыми .gz/.br. url_for('static', ...)
+# подставляет эти имена, поэтому файлы кэшируются браузером навсегда, а новая
+# версия получает новый адрес. Без сборки статика отдается как обычно.
+COMPRESSIBLE_ASSETS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+
+def build_assets(source, target):
+    """Копии файлов source с хэшем в имени, их .gz/.br и manifest.json в target"""
+    manifest = {}
+    for root, dirs, files in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and os.path.join(root, d) != target)
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, source).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            stem, extension = os.path.splitext(relative)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+            
+            variants = {'': data}
+            if extension in COMPRESSIBLE_ASSETS:
+                # Максимальное сжатие: файл сжимается один раз при сборке
+                variants['.gz'] = gzip.compress(data, compresslevel=9, mtime=0)
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data, quality=11)
+            for suffix, content in variants.items():
+                if suffix and len(content) >= len(data):
+                    continue
+                output = os.path.join(target, hashed + suffix)
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                with open(output, 'wb') as f:
+                    f.write(content)
+            manifest[relative] = hashed
+    
+    # Прежние версии файлов остаются: их могут запросить страницы, открытые до выкладки
+    manifest_path = os.path.join(target, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    asset_manifest.cache_clear()
+    fingerprinted_assets.cache_clear()
+    return manifest
+
+@lru_cache(maxsize=None)
+def asset_manifest():
+    """Исходный путь -> путь с хэшем из манифеста ({} без сборки)"""
+    try:
+        with open(os.path.join(app.config['ASSETS_DIR'], 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+@lru_cache(maxsize=None)
+def fingerprinted_assets():
+    return frozenset(asset_manifest().values())
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    # В режиме отладки статику правят на ходу, и манифест мог устареть
+    if endpoint == 'static' and not app.debug:
+        filename = values.get('filename')
+        values['filename'] = asset_manifest().get(filename, filename)
+
+def accepted_encoding(encodings):
+    """Первое из сжатий, которое принимает клиент, или None"""
+    for encoding in encodings:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def static_file(filename):
+    """Статика; файлы из манифеста - с вечным кэшем и готовым .br/.gz"""
+    if filename not in fingerprinted_assets():
+        return app.send_static_file(filename)
+    
+    directory = app.config['ASSETS_DIR']
+    encoding = accepted_encoding(['br', 'gzip'])
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    if suffix and os.path.exists(os.path.join(directory, filename + suffix)):
+        response = send_from_directory(directory, filename + suffix, mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, filename)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['ASSETS_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
+
+@app.after_request
+def compress_response(response):
+    """Сжатие HTML, JSON и CSV больше COMPRESS_MIN_SIZE (потоковые ответы не трогаются)"""
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    encoding = accepted_encoding(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if encoding is None or len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=app.config['COMPRESS_BROTLI_LEVEL']))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'], mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    # Сильный ETag обещает побайтовое совпадение, а сжатые варианты различаются
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Инструментирование
+# Включается METRICS_ENABLED=1. Обработчики регистрируются только во включенном
+# режиме, поэтому в выключенном состоянии запросы не платят за замеры ничего.
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_QUERY_STATEMENTS_MAX = 100  # Разных медленных запросов в метриках
+
+class RequestMetrics:
+    """Накопленные метрики процесса в формате, удобном для вывода Prometheus"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> число запросов
+        self.durations = {}  # endpoint -> [счетчики корзин, сумма, число]
+        self.sql = {}  # endpoint -> [число запросов, время]
+        self.slow_queries = {}  # нормализованный SQL -> число
+    
+    def observe_request(self, endpoint, method, status, duration, sql_count, sql_time):
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            
+            histogram = self.durations.setdefault(endpoint, [[0] * len(REQUEST_DURATION_BUCKETS), 0.0, 0])
+            bucket = bisect.bisect_left(REQUEST_DURATION_BUCKETS, duration)
+            if bucket < len(REQUEST_DURATION_BUCKETS):
+                histogram[0][bucket] += 1
+            histogram[1] += duration
+            histogram[2] += 1
+            
+            sql = self.sql.setdefault(endpoint, [0, 0.0])
+            sql[0] += sql_count
+            sql[1] += sql_time
+    
+    def observe_slow_query(self, statement):
+        with self.lock:
+            if statement in self.slow_queries or len(self.slow_queries) < SLOW_QUERY_STATEMENTS_MAX:
+                self.slow_queries[statement] = self.slow_queries.get(statement, 0) + 1
+    
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        def label(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+        
+        lines = []
+        with self.lock:
+            lines += ['# HELP repair_http_requests_total HTTP-запросы по маршрутам',
+                      '# TYPE repair_http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'repair_http_requests_total{{endpoint="{label(endpoint)}",method="{method}",status="{status}"}} {count}')
+            
+            lines += ['# HELP repair_http_request_duration_seconds Время обработки запроса',
+                      '# TYPE repair_http_request_duration_seconds histogram']
+            for endpoint, (buckets, total, count) in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(REQUEST_DURATION_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f'repair_http_request_duration_seconds_bucket{{endpoint="{label(endpoint)}",le="{bound}"}} {cumulative}')
+                lines.append(f'repair_http_request_duration_seconds_bucket{{endpoint="{label(endpoint)}",le="+Inf"}} {count}')
+                lines.append(f'repair_http_request_duration_seconds_sum{{endpoint="{label(endpoint)}"}} {total:.6f}')
+                lines.append(f'repair_http_request_duration_seconds_count{{endpoint="{label(endpoint)}"}} {count}')
+            
+            lines += ['# HELP repair_sql_queries_total SQL-запросы, выполненные при обработке маршрута',
+                      '# TYPE repair_sql_queries_total counter']
+            for endpoint, (count, _) in sorted(self.sql.items()):
+                lines.append(f'repair_sql_queries_total{{endpoint="{label(endpoint)}"}} {count}')
+            lines += ['# HELP repair_sql_duration_seconds_total Время SQL-запросов маршрута',
+                      '# TYPE repair_sql_duration_seconds_total counter']
+            for endpoint, (_, total) in sorted(self.sql.items()):
+                lines.append(f'repair_sql_duration_seconds_total{{endpoint="{label(endpoint)}"}} {total:.6f}')
+            
+            lines += ['# HELP repair_slow_queries_total Медленные SQL-запросы (нормализованные)',
+                      '# TYPE repair_slow_queries_total counter']
+            for statement, count in sorted(self.slow_queries.items()):
+                lines.append(f'repair_slow_queries_total{{statement="{label(statement)}"}} {count}')
+        
+        with fragment_cache.lock:
+            hits, misses, entries = fragment_cache.hits, fragment_cache.misses, len(fragment_cache.entries)
+        lines += ['# HELP repair_fragment_cache_requests_total Обращения к кэшу фрагментов шаблонов',
+                  '# TYPE repair_fragment_cache_requests_total counter',
+                  f'repair_fragment_cache_requests_total{{result="hit"}} {hits}',
+                  f'repair_fragment_cache_requests_total{{result="miss"}} {misses}',
+                  '# HELP repair_fragment_cache_hit_ratio Доля попаданий в кэш фрагментов',
+                  '# TYPE repair_fragment_cache_hit_ratio gauge',
+                  f'repair_fragment_cache_hit_ratio {hits / (hits + misses) if hits + misses else 0:.4f}',
+                  '# HELP repair_fragment_cache_entries Фрагментов в кэше',
+                  '# TYPE repair_fragment_cache_entries gauge',
+                  f'repair_fragment_cache_entries {entries}']
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+def normalize_statement(statement):
+    """SQL без литералов и лишних пробелов: одинаковые запросы с разными значениями совпадают"""
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    statement = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', statement)
+    statement = re.sub(r'\(__\[POSTCOMPILE_\w+\]\)', '(?, ...)', statement)
+    return re.sub(r'\s+', ' ', statement).strip()
+
+def setup_instrumentation():
+    """Регистрация замеров SQL и запросов Flask (вызывается при METRICS_ENABLED)"""
+    with app.app_context():
+        engine = db.engine
+    
+    @db.event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+    
+    # Запрос с ошибкой не доходит до after_cursor_execute: его отметку снимает handle_error
+    @db.event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        connection = context.connection
+        if connection is not None and context.execution_context is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+    
+    @db.event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if has_request_context():
+            g.sql_count = g.get('sql_count', 0) + 1
+            g.sql_time = g.get('sql_time', 0.0) + elapsed
+        if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+            normalized = normalize_statement(statement)
+            request_metrics.observe_slow_query(normalized)
+            app.logger.warning('Медленный SQL (%.1f мс): %s', elapsed * 1000, normalized)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if app.config['PROFILE_SAMPLE_RATE'] and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            import cProfile
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+    
+    @app.after_request
+    def record_request(response):
+        if 'request_started' not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        sql_count, sql_time = g.get('sql_count', 0), g.get('sql_time', 0.0)
+        endpoint = request.endpoint or 'unknown'
+        request_metrics.observe_request(endpoint, request.method, response.status_code,
+                                        duration, sql_count, sql_time)
+        response.headers['Server-Timing'] = f'app;dur={duration * 1000:.1f}, db;dur={sql_time * 1000:.1f};desc="{sql_count} SQL"'
+        
+        profiler = g.pop('profiler', None)
+        if profiler:
+            profiler.disable()
+            if duration * 1000 >= app.config['PROFILE_THRESHOLD_MS']:
+                os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+                filename = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{duration * 1000:.0f}ms.prof"
+                profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], filename))
+        return response
+    
+    @app.route('/metrics')
+    def metrics():
+        # В метриках текст медленных SQL: только администратор или сборщик с METRICS_TOKEN
+        token = app.config['METRICS_TOKEN']
+        authorized = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        if not authorized:
+            user = get_current_user()
+            if not user or user.role != 'admin':
+                return Response('Доступ запрещен\n', status=403, mimetype='text/plain')
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+if app.config['METRICS_ENABLED']:
+    setup_instrumentation()
+
 # Маршруты
 @app.route('/')
 def index():
@@ -103,12 +1733,27 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        print(f"DEBUG: Попытка входа - пользователь: {username}, пароль: {password}")
+        app.logger.debug('Попытка входа: %s', username)
         
-        user = User.query.filter_by(username=username, password=password).first()
+        user = User.query.filter_by(username=username).first()
+        try:
+            matches, needs_rehash = run_in_password_pool(
+                check_password, user.password if user else dummy_password_hash(), password)
+        except PasswordPoolBusy:
+            flash('Сервер перегружен, попробуйте войти через несколько секунд', 'danger')
+            return render_template('login.html'), 503
         
-        if user:
-            print(f"DEBUG: Пользователь найден - {user.username}, роль: {user.role}")
+        if user and matches:
+            if needs_rehash:
+                # Постепенный переход на хэши: пароль известен только в момент входа
+                try:
+                    user.password = run_in_password_pool(hash_password, password)
+                    db.session.commit()
+                except PasswordPoolBusy:
+                    # Пароль уже проверен: хэш пересчитается при следующем входе
+                    app.logger.warning('Пул паролей занят, хэш пользователя %s не обновлен', user.username)
+
+            app.logger.debug('Вход выполнен: %s (%s)', user.username, user.role)
             session['user_id'] = user.id
             session['username'] = user.username
             session['role'] = user.role
@@ -116,7 +1761,7 @@ def login():
             flash('Вход выполнен успешно!', 'success')
             return redirect(url_for('dashboard'))
         else:
-            print(f"DEBUG: Пользователь НЕ найден")
+            app.logger.debug('Неудачный вход: %s', username)
             flash('Неверное имя пользователя или пароль', 'danger')
     
     return render_template('login.html')
@@ -129,22 +1774,13 @@ def logout():
 
 @app.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # Статистика для админа и специалиста
     if user.role in ['admin', 'technician']:
-        total_requests = RepairRequest.query.count()
-        pending_requests = RepairRequest.query.filter_by(status='pending').count()
-        in_progress_requests = RepairRequest.query.filter_by(status='in_progress').count()
-        completed_requests = RepairRequest.query.filter_by(status='completed').count()
-        
-        stats = {
-            'total': total_requests,
-            'pending': pending_requests,
-            'in_progress': in_progress_requests,
-            'completed': completed_requests
-        }
+        stats = get_request_stats()
     else:
         stats = None
     
@@ -152,23 +1788,31 @@ def dashboard():
 
 @app.route('/requests')
 @login_required
+@read_only
 def view_requests():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
-    if user.role in ['admin', 'technician']:
-        # Админ и специалист видят все заявки
-        requests = RepairRequest.query.order_by(RepairRequest.created_at.desc()).all()
-    else:
-        # Пользователь видит только свои заявки
-        requests = RepairRequest.query.filter_by(user_id=user.id).order_by(RepairRequest.created_at.desc()).all()
+    filters = get_request_filters(request.args)
+    # Архив подключается только по запросу: обычный список идет по рабочей таблице
+    query = request_list_query(include_archived='archived' in filters)
+    if user.role not in ['admin', 'technician']:
+        # Пользователь видит свои заявки и те, к которым присоединился
+        query = query.filter(visible_to_user(user.id))
     
-    return render_template('view_requests.html', requests=requests, user=user)
+    query = apply_request_filters(query, filters)
+    cursor = request.args.get('cursor')
+    requests, next_cursor = paginate_requests(query, cursor, get_page_size(request.args))
+    # Отметка для опроса изменений с тем же набором фильтров (?since=)
+    watermark = change_watermark(query.with_entities(db.func.max(RepairRequest.updated_at)).scalar())
+    
+    return render_template('view_requests.html', requests=requests, user=user, filters=filters,
+                          cursor=cursor, next_cursor=next_cursor, watermark=watermark)
 
 @app.route('/requests/create', methods=['GET', 'POST'])
 @login_required
 def create_request():
     # Только пользователи (не админы и не специалисты) могут создавать заявки
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if user.role not in ['user']:
         flash('Только обычные пользователи могут создавать заявки', 'danger')
         return redirect(url_for('dashboard'))
@@ -179,21 +1823,56 @@ def create_request():
         problem_description = request.form['problem_description']
         priority = request.form.get('priority', 'medium')
         
+        if priority not in REQUEST_PRIORITIES:
+            flash('Неизвестный приоритет заявки', 'danger')
+            return render_template('create_request.html', duplicates=[], form=request.form), 400
+        
+        fields = duplicate_fields(computer_number, problem_description)
+        if not request.form.get('confirm_new'):
+            duplicates = find_duplicates(fields)
+            if duplicates:
+                return render_template('create_request.html', duplicates=duplicates, form=request.form)
+        
         new_request = RepairRequest(
             user_id=session['user_id'],
             computer_number=computer_number,
             location=location,
             problem_description=problem_description,
-            priority=priority
+            priority=priority,
+            **fields
         )
         
         db.session.add(new_request)
+        bump_request_counter('pending', priority, location, 1)
+        db.session.flush()
+        record_status_changes([(new_request, None, 'pending')], user.id)
+        notify_author_later(new_request, 'created')
         db.session.commit()
+        publish_request_event('created', new_request, user.full_name)
         
         flash('Заявка успешно создана!', 'success')
         return redirect(url_for('view_requests'))
     
-    return render_template('create_request.html')
+    return render_template('create_request.html', duplicates=[], form={})
+
+@app.route('/requests/<int:request_id>/join', methods=['POST'])
+@login_required
+def join_request(request_id):
+    """Присоединение к существующей заявке вместо создания дубликата.
+
+    Можно присоединиться только к той заявке, которую мог предложить поиск
+    дублей: открытой и по тому же компьютеру, что указан в форме.
+    """
+    repair_request = RepairRequest.query.get_or_404(request_id)
+    computer_key = normalize_computer_number(request.form.get('computer_number', ''))
+    if repair_request.status == 'completed' or not computer_key or repair_request.computer_key != computer_key:
+        abort(404)
+    user = get_current_user()
+    if repair_request.user_id != user.id and not db.session.get(RequestWatcher, (request_id, user.id)):
+        db.session.add(RequestWatcher(request_id=request_id, user_id=user.id))
+        db.session.commit()
+    flash(f'Вы присоединились к заявке #{request_id} - уведомления о ней будут приходить и вам', 'success')
+    return redirect(url_for('view_requests'))
 
 @app.route('/requests/<int:request_id>/update_status', methods=['POST'])
 @login_required
@@ -201,13 +1880,184 @@ def create_request():
 def update_request_status(request_id):
     repair_request = RepairRequest.query.get_or_404(request_id)
     new_status = request.form['status']
+    # Статус, который видел специалист: смена чужого изменения не перезаписывает
+    expected_status = request.form.get('expected_status', repair_request.status)
     
-    repair_request.status = new_status
-    db.session.commit()
+    if new_status not in REQUEST_STATUSES:
+        flash('Неизвестный статус заявки', 'danger')
+        return redirect(url_for('view_requests'))
+    
+    if new_status != expected_status:
+        priority, location = repair_request.priority, repair_request.location
+        end_read_transaction()
+        values = {'status': new_status, 'updated_at': datetime.utcnow()}
+        if new_status == 'in_progress':
+            values['assignee_id'] = session['user_id']
+        changed = db.session.execute(
+            db.update(RepairRequest)
+            .where(RepairRequest.id == request_id, RepairRequest.status == expected_status)
+            .values(**values)
+        )
+        if changed.rowcount != 1:
+            db.session.rollback()
+            flash('Статус заявки уже изменил другой специалист, обновите страницу', 'warning')
+            return redirect(url_for('view_requests'))
+        
+        bump_request_counter(expected_status, priority, location, -1)
+        bump_request_counter(new_status, priority, location, 1)
+        record_status_changes([(repair_request, expected_status, new_status)], session['user_id'])
+        notify_author_later(repair_request, 'status')
+        db.session.commit()
+        publish_request_event('status', repair_request, repair_request.author.full_name)
     
     flash('Статус заявки обновлен!', 'success')
     return redirect(url_for('view_requests'))
 
+def apply_status_updates(updates):
+    """Пакетная смена статусов с оптимистической блокировкой по updated_at.
+
+    Заявка меняется, только если ее updated_at совпадает с expected_updated_at;
+    на каждый новый статус выполняется один UPDATE ... WHERE id IN (...).
+    Возвращает результат по каждому элементу в исходном порядке.
+    """
+    results = [None] * len(updates)
+    expected = {}
+    for index, item in enumerate(updates):
+        request_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(request_id, int) or isinstance(request_id, bool):
+            results[index] = {'id': request_id, 'result': 'invalid', 'error': 'Не указан id заявки'}
+        elif item.get('status') not in REQUEST_STATUSES:
+            results[index] = {'id': request_id, 'result': 'invalid', 'error': 'Неизвестный статус заявки'}
+        elif not isinstance(item.get('expected_updated_at'), str) or parse_datetime(item['expected_updated_at']) is None:
+            results[index] = {'id': request_id, 'result': 'invalid', 'error': 'expected_updated_at должен быть датой в формате ISO'}
+        elif request_id in expected:
+            results[index] = {'id': request_id, 'result': 'invalid', 'error': 'Заявка указана несколько раз'}
+        else:
+            expected[request_id] = (index, item['status'], parse_datetime(item['expected_updated_at']))
+    
+    current = {row.id: row for row in request_list_query().filter(RepairRequest.id.in_(list(expected)))} if expected else {}
+    by_status = {}
+    for request_id, (index, new_status, updated_at) in expected.items():
+        row = current.get(request_id)
+        if row is None:
+            results[index] = {'id': request_id, 'result': 'not_found'}
+        elif row.updated_at != updated_at:
+            results[index] = {'id': request_id, 'result': 'conflict', 'status': row.status,
+                              'version': row.updated_at.isoformat()}
+        elif row.status == new_status:
+            results[index] = {'id': request_id, 'result': 'unchanged', 'status': row.status,
+                              'version': row.updated_at.isoformat()}
+        else:
+            by_status.setdefault(new_status, []).append(request_id)
+    
+    table = RepairRequest.__table__
+    now = datetime.utcnow()
+    changed = []
+    for new_status, ids in by_status.items():
+        # Версия проверяется в том же UPDATE: строки, измененные после чтения, не затрагиваются
+        versions = {request_id: expected[request_id][2] for request_id in ids}
+        values = {'status': new_status, 'updated_at': now}
+        if new_status == 'in_progress':
+            values['assignee_id'] = session['user_id']
+        updated_ids = set(db.session.execute(
+            table.update()
+            .where(table.c.id.in_(ids), table.c.updated_at == db.case(versions, value=table.c.id))
+            .values(**values)
+            .returning(table.c.id)
+        ).scalars())
+        counter_deltas = {}
+        for request_id in ids:
+            row, index = current[request_id], expected[request_id][0]
+            if request_id not in updated_ids:
+                results[index] = {'id': request_id, 'result': 'conflict'}
+                continue
+            for status, delta in ((row.status, -1), (new_status, 1)):
+                key = (status, row.priority, row.location)
+                counter_deltas[key] = counter_deltas.get(key, 0) + delta
+            results[index] = {'id': request_id, 'result': 'updated', 'status': new_status, 'version': now.isoformat()}
+            changed.append(SimpleNamespace(**dict(row._asdict(), **values)))
+        for (status, priority, location), delta in counter_deltas.items():
+            if delta:
+                bump_request_counter(status, priority, location, delta)
+    
+    record_status_changes([(current[row.id], current[row.id].status, row.status) for row in changed],
+                          session['user_id'])
+    for row in changed:
+        notify_author_later(row, 'status')
+    db.session.commit()
+    for row in changed:
+        publish_request_event('status', row, row.author_name)
+    return results
+
+@app.route('/api/requests/status', methods=['POST'])
+@login_required
+@technician_or_admin_required
+def api_update_statuses():
+    """Смена статусов нескольких заявок одной транзакцией"""
+    data = request.get_json(silent=True)
+    updates = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'Ожидается JSON вида {"updates": [{"id", "status", "expected_updated_at"}]}'}), 400
+    if len(updates) > app.config['BULK_STATUS_MAX']:
+        return jsonify({'error': f"Не больше {app.config['BULK_STATUS_MAX']} заявок за запрос"}), 400
+    
+    results = apply_status_updates(updates)
+    summary = {}
+    for result in results:
+        summary[result['result']] = summary.get(result['result'], 0) + 1
+    return jsonify({'results': results, 'summary': summary})
+
+def claim_next_request(user_id):
+    """Выдача специалисту старейшей ожидающей заявки с наивысшим приоритетом.
+
+    На PostgreSQL строка блокируется через FOR UPDATE SKIP LOCKED, на SQLite
+    заявку забирает условный UPDATE ... WHERE status = 'pending': при гонке
+    выигрывает один специалист, остальные пробуют следующую заявку.
+    Возвращает заявку или None, если ожидающих нет.
+    """
+    table = RepairRequest.__table__
+    postgresql = db.engine.dialect.name == 'postgresql'
+    for priority in reversed(REQUEST_PRIORITIES):
+        pending = (db.select(table.c.id)
+                   .where(table.c.status == 'pending', table.c.priority == priority)
+                   .order_by(table.c.created_at))
+        while True:
+            if postgresql:
+                candidates = db.session.execute(pending.limit(1).with_for_update(skip_locked=True)).scalars().all()
+            else:
+                candidates = db.session.execute(pending.limit(5)).scalars().all()
+                end_read_transaction()
+            if not candidates:
+                break
+            for request_id in candidates:
+                claimed = db.session.execute(
+                    table.update().where(table.c.id == request_id, table.c.status == 'pending')
+                    .values(status='in_progress', assignee_id=user_id, updated_at=datetime.utcnow())
+                )
+                if claimed.rowcount != 1:
+                    db.session.rollback()
+                    continue
+                repair_request = db.session.get(RepairRequest, request_id, populate_existing=True)
+                bump_request_counter('pending', repair_request.priority, repair_request.location, -1)
+                bump_request_counter('in_progress', repair_request.priority, repair_request.location, 1)
+                record_status_changes([(repair_request, 'pending', 'in_progress')], user_id)
+                notify_author_later(repair_request, 'status')
+                db.session.commit()
+                publish_request_event('status', repair_request, repair_request.author.full_name)
+                return repair_request
+    db.session.rollback()
+    return None
+
+@app.route('/api/tasks/claim', methods=['POST'])
+@login_required
+@technician_or_admin_required
+def api_claim_task():
+    """Взять в работу следующую заявку из очереди"""
+    repair_request = claim_next_request(session['user_id'])
+    if repair_request is None:
+        return jsonify({'error': 'Нет ожидающих заявок'}), 404
+    return jsonify({'request': task_card_data(repair_request, repair_request.author.full_name)})
+
 @app.route('/requests/<int:request_id>/view')
 @login_required
 @technician_or_admin_required
@@ -216,6 +2066,14 @@ def view_request_details(request_id):
     repair_request = RepairRequest.query.get_or_404(request_id)
     return render_template('request_details.html', request=repair_request)
 
+def user_validation_error(username, password):
+    """Правила для нового пользователя (форма и импорт): текст ошибки или None"""
+    if len(password) < 6:
+        return 'Пароль должен содержать минимум 6 символов'
+    if not username.isalnum():
+        return 'Имя пользователя должно содержать только буквы и цифры'
+    return None
+
 @app.route('/users/create', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -232,26 +2090,30 @@ def create_user():
             flash('Пользователь с таким именем уже существует', 'danger')
             return redirect(url_for('create_user'))
         
-        # Валидация пароля
-        if len(password) < 6:
-            flash('Пароль должен содержать минимум 6 символов', 'danger')
+        # Валидация пароля и имени пользователя
+        error = user_validation_error(username, password)
+        if error:
+            flash(error, 'danger')
             return redirect(url_for('create_user'))
         
-        # Валидация имени пользователя
-        if not username.isalnum():
-            flash('Имя пользователя должно содержать только буквы и цифры', 'danger')
+        # Хэш считается в пуле паролей, как при входе
+        try:
+            password_hash = run_in_password_pool(hash_password, password)
+        except PasswordPoolBusy:
+            flash('Сервер перегружен, попробуйте создать пользователя через несколько секунд', 'danger')
             return redirect(url_for('create_user'))
         
         # Создаем нового пользователя
         new_user = User(
             username=username,
-            password=password,
+            password=password_hash,
             full_name=full_name,
             role=role
         )
         
         db.session.add(new_user)
         db.session.commit()
+        invalidate_user_cache(new_user.id)
         
         # Детальное сообщение о создании пользователя
         role_names = {
@@ -274,37 +2136,260 @@ def create_user():
     return render_template('create_user.html')
 
 # API endpoint для получения заявок (для AJAX)
+def requests_etag(max_updated_at, count):
+    """Слабый ETag списка: последнее изменение, число строк и параметры запроса"""
+    key = f"{max_updated_at}|{count}|{get_current_user().id}|{request.query_string.decode()}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+def serialize_request(req):
+    return {
+        'id': req.id,
+        'computer_number': req.computer_number,
+        'location': req.location,
+        'problem_description': req.problem_description,
+        'status': req.status,
+        'priority': req.priority,
+        'created_at': req.created_at.strftime('%Y-%m-%d %H:%M'),
+        'updated_at': req.updated_at.strftime('%Y-%m-%d %H:%M:%S') if req.updated_at else None,
+        'version': req.updated_at.isoformat() if req.updated_at else None,  # Для expected_updated_at
+        'author': req.author_name,
+        'assignee_id': req.assignee_id,
+        'archived': bool(req.archived)
+    }
+
+def change_watermark(max_updated_at):
+    """Отметка для ?since=: изменения после max_updated_at (None, если заявок нет)"""
+    return f"{max_updated_at.strftime('%Y%m%d%H%M%S%f')}-0" if max_updated_at else None
+
+def changed_requests(query, since, limit):
+    """Заявки, измененные после отметки (updated_at, id), по возрастанию изменения"""
+    updated_at, request_id = since
+    query = query.filter(db.or_(
+        RepairRequest.updated_at > updated_at,
+        db.and_(RepairRequest.updated_at == updated_at, RepairRequest.id > request_id)
+    ))
+    
+    changed = query.order_by(RepairRequest.updated_at, RepairRequest.id).limit(limit + 1).all()
+    return changed[:limit], len(changed) > limit
+
 @app.route('/api/requests')
 @login_required
+@read_only
 def api_requests():
-    user = User.query.get(session['user_id'])
+    """Список заявок постранично, а с ?since=<отметка> - только изменения.
+
+    Ответ помечается слабым ETag: если данные не менялись, повторный
+    опрос с If-None-Match получает 304 без сериализации строк.
+    """
+    user = get_current_user()
     
-    if user.role in ['admin', 'technician']:
-        requests = RepairRequest.query.order_by(RepairRequest.created_at.desc()).all()
+    filters = get_request_filters(request.args)
+    query = request_list_query(include_archived='archived' in filters)
+    if user.role not in ['admin', 'technician']:
+        query = query.filter(visible_to_user(user.id))
+    query = apply_request_filters(query, filters)
+    
+    since = None
+    if 'since' in request.args:
+        # Отметка из прошлого ответа или просто дата-время ISO
+        since = decode_cursor(request.args['since'])
+        if since is None and parse_datetime(request.args['since']):
+            since = (parse_datetime(request.args['since']), 0)
+        if since is None:
+            return jsonify({'error': 'Неверная отметка since'}), 400
+    
+    max_updated_at, count = query.with_entities(db.func.max(RepairRequest.updated_at), db.func.count(RepairRequest.id)).one()
+    etag = requests_etag(max_updated_at, count)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    if since:
+        requests, has_more = changed_requests(query, since, get_page_size(request.args))
+        watermark = encode_cursor(requests[-1], 'updated_at') if requests else request.args['since']
+        body = {'requests': [serialize_request(req) for req in requests], 'watermark': watermark, 'has_more': has_more}
     else:
-        requests = RepairRequest.query.filter_by(user_id=user.id).order_by(RepairRequest.created_at.desc()).all()
+        requests, next_cursor = paginate_requests(query, request.args.get('cursor'), get_page_size(request.args))
+        # Отметка для последующих запросов изменений (?since=); заявки с тем же
+        # updated_at вернутся в первой порции изменений повторно - клиент обновляет по id
+        watermark = change_watermark(max_updated_at)
+        body = {'requests': [serialize_request(req) for req in requests], 'next_cursor': next_cursor, 'watermark': watermark}
     
-    requests_list = []
-    for req in requests:
-        requests_list.append({
+    response = jsonify(body)
+    response.set_etag(etag, weak=True)
+    return response
+
+# Потоковая выгрузка заявок (NDJSON / CSV)
+def parse_datetime(value):
+    """Разбор даты или даты-времени в формате ISO, None если значение неверное"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def export_rows(query):
+    """Строки выгрузки, читаемые из серверного курсора пачками"""
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+    for req in query.order_by(RepairRequest.id).yield_per(batch_size):
+        yield {
             'id': req.id,
             'computer_number': req.computer_number,
             'location': req.location,
             'problem_description': req.problem_description,
             'status': req.status,
             'priority': req.priority,
-            'created_at': req.created_at.strftime('%Y-%m-%d %H:%M'),
-            'author': req.author.full_name
-        })
+            'created_at': req.created_at.isoformat(),
+            'updated_at': req.updated_at.isoformat() if req.updated_at else None,
+            'author': req.author_name
+        }
+
+def generate_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for index, row in enumerate(rows, 1):
+        writer.writerow(row)
+        # Отдаем накопленное каждые 100 строк, чтобы не держать выгрузку в памяти
+        if index % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/api/requests/export')
+@login_required
+@read_only
+def export_requests():
+    """Выгрузка заявок потоком: ?format=ndjson|csv, фильтры списка и since"""
+    user = get_current_user()
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Формат выгрузки: ndjson или csv'}), 400
+    
+    filters = get_request_filters(request.args)
+    query = request_list_query(include_archived='archived' in filters)
+    if user.role not in ['admin', 'technician']:
+        query = query.filter(visible_to_user(user.id))
+    query = apply_request_filters(query, filters)
+    
+    if 'since' in request.args:
+        since = parse_datetime(request.args['since'])
+        if since is None:
+            return jsonify({'error': 'Параметр since должен быть датой в формате ISO'}), 400
+        query = query.filter(RepairRequest.updated_at >= since)
+    
+    rows = export_rows(query)
+    filename = f"requests-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    if export_format == 'csv':
+        body, mimetype = generate_csv(rows), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(rows), 'application/x-ndjson'
+    
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Поиск заявок
+def run_search(user):
+    """Поиск по параметрам q, page и archived текущего запроса с учетом роли"""
+    text = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    archived = request.args.get('archived') == '1'
+    user_id = None if user.role in ['admin', 'technician'] else user.id
+    results, has_next = search_requests(text, user_id, page, app.config['SEARCH_PAGE_SIZE'],
+                                        include_archived=archived) if text else ([], False)
+    return text, page, archived, results, has_next
+
+@app.route('/search')
+@login_required
+@read_only
+def search():
+    user = get_current_user()
+    text, page, archived, results, has_next = run_search(user)
+    return render_template('search.html', user=user, q=text, page=page, archived=archived,
+                          results=results, has_next=has_next)
+
+@app.route('/api/search')
+@login_required
+@read_only
+def api_search():
+    text, page, archived, results, has_next = run_search(get_current_user())
+    for row in results:
+        row['created_at'] = row['created_at'].strftime('%Y-%m-%d %H:%M')
+        row['snippet'] = str(row['snippet'])
+        row['author'] = row.pop('author_name')
+        row['archived'] = bool(row['archived'])
+    return jsonify({'results': results, 'page': page, 'has_next': has_next})
+
+# Поток событий для экранов специалистов
+@app.route('/api/events')
+@login_required
+@technician_or_admin_required
+def request_events():
+    """Server-Sent Events: создание заявок и смена статуса"""
+    subscriber = event_broker.subscribe()
+    if subscriber is None:
+        # Все места для потоков событий заняты: клиент повторит попытку позже
+        return jsonify({'error': 'Слишком много открытых панелей, повторите позже'}), 503, {'Retry-After': '30'}
+    keepalive = app.config['EVENTS_KEEPALIVE']
     
-    return jsonify(requests_list)
+    # Генератор работает без контекста запроса: соединение с БД не удерживается
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event.get('request'), ensure_ascii=False)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# API endpoint статистики заявок
+@app.route('/api/stats')
+@login_required
+@technician_or_admin_required
+@read_only
+def api_stats():
+    stats = get_request_stats()
+    stats['by_priority'] = dict(stats['by_priority'])
+    stats['by_location'] = dict(stats['by_location'])
+    return jsonify(stats)
+
+# Отчет о времени ремонта по дневным итогам
+@app.route('/api/reports/resolution')
+@login_required
+@technician_or_admin_required
+@read_only
+def api_resolution_report():
+    group = request.args.get('group', 'location')
+    if group not in REPORT_GROUPS:
+        return jsonify({'error': f"group: {', '.join(REPORT_GROUPS)}"}), 400
+    date_to = parse_date(request.args.get('date_to')) or datetime.utcnow()
+    date_from = parse_date(request.args.get('date_from')) or date_to - timedelta(days=30)
+    return jsonify({
+        'group': group,
+        'date_from': date_from.date().isoformat(),
+        'date_to': date_to.date().isoformat(),
+        'rows': get_resolution_report(date_from.date(), date_to.date(), group)
+    })
 
 # Маршрут для специалиста - мои задачи
 @app.route('/technician/tasks')
 @login_required
+@read_only
 def technician_tasks():
     """Задачи для специалиста"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # Проверяем, что это специалист
     if user.role != 'technician':
@@ -312,8 +2397,8 @@ def technician_tasks():
         return redirect(url_for('dashboard'))
     
     # Специалист видит все заявки, но можно фильтровать только те, что в работе
-    in_progress_requests = RepairRequest.query.filter_by(status='in_progress').order_by(RepairRequest.created_at.desc()).all()
-    pending_requests = RepairRequest.query.filter_by(status='pending').order_by(RepairRequest.created_at.desc()).all()
+    in_progress_requests = request_list_query().filter(RepairRequest.status == 'in_progress').order_by(RepairRequest.created_at.desc()).all()
+    pending_requests = request_list_query().filter(RepairRequest.status == 'pending').order_by(RepairRequest.created_at.desc()).all()
     
     return render_template('technician_tasks.html', 
                           in_progress_requests=in_progress_requests,
@@ -363,14 +2448,19 @@ def create_default_users():
         
         created_count = 0
         existing_count = 0
+        password_hashes = hash_passwords([user_data['password'] for user_data in all_users])
+        
+        # Существующие пользователи одним запросом
+        usernames = [user_data['username'] for user_data in all_users]
+        existing_users = {user.username: user for user in User.query.filter(User.username.in_(usernames))}
         
-        for user_data in all_users:
+        for user_data, password_hash in zip(all_users, password_hashes):
             # Проверяем, существует ли уже пользователь
-            existing_user = User.query.filter_by(username=user_data['username']).first()
+            existing_user = existing_users.get(user_data['username'])
             
             if existing_user:
                 # Обновляем существующего пользователя
-                existing_user.password = user_data['password']
+                existing_user.password = password_hash
                 existing_user.role = user_data['role']
                 existing_user.full_name = user_data['full_name']
                 existing_count += 1
@@ -379,7 +2469,7 @@ def create_default_users():
                 # Создаем нового пользователя
                 new_user = User(
                     username=user_data['username'],
-                    password=user_data['password'],
+                    password=password_hash,
                     role=user_data['role'],
                     full_name=user_data['full_name']
                 )
@@ -389,6 +2479,7 @@ def create_default_users():
         
         try:
             db.session.commit()
+            invalidate_user_cache()
             print("\n" + "=" * 60)
             print("РЕЗУЛЬТАТ:")
             print(f"✅ Создано: {created_count} пользователей")
@@ -455,10 +2546,10 @@ def create_test_requests():
                 }
             ]
             
+            user_ids = {user.id for user in users}
             for req_data in test_requests:
                 # Проверяем, существует ли пользователь с таким ID
-                user = User.query.get(req_data['user_id'])
-                if user:
+                if req_data['user_id'] in user_ids:
                     request = RepairRequest(
                         user_id=req_data['user_id'],
                         computer_number=req_data['computer_number'],
@@ -477,46 +2568,404 @@ def create_test_requests():
                 db.session.rollback()
                 print(f"❌ Ошибка при создании заявок: {e}")
 
-if __name__ == '__main__':
-    # Создаем таблицы
-    with app.app_context():
+@app.cli.command('replica-sync')
+def replica_sync_command():
+    """Копирование основной БД SQLite в файлы реплик (для проверки на одной машине)"""
+    import sqlite3
+    
+    if db.engine.dialect.name != 'sqlite':
+        print("❌ Команда только для SQLite: реплики PostgreSQL настраиваются репликацией сервера")
+        return
+    source = db.engine.raw_connection()
+    try:
+        for key in app.config['SQLALCHEMY_BINDS']:
+            replica = db.engines[key]
+            if replica.dialect.name != 'sqlite':
+                continue
+            target = sqlite3.connect(replica.url.database)
+            source.driver_connection.backup(target)
+            target.close()
+            print(f"✓ {replica.url.database}")
+    finally:
+        source.close()
+
+@app.cli.command('jobs-drain')
+def jobs_drain_command():
+    """Выполнение всех готовых фоновых задач"""
+    processed = 0
+    while run_next_job():
+        processed += 1
+    counts = dict(db.session.query(Job.status, db.func.count()).group_by(Job.status).all())
+    print(f"✅ Выполнено задач: {processed}")
+    print("   " + ", ".join(f"{status}: {counts.get(status, 0)}" for status in ('queued', 'running', 'done', 'failed')))
+
+@app.cli.command('archive-requests')
+@click.option('--days', type=int, default=None, help='Возраст завершенных заявок (по умолчанию ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', type=int, default=None, help='Заявок в одной транзакции')
+def archive_requests_command(days, batch_size):
+    """Перенос старых завершенных заявок в архив"""
+    started = time.perf_counter()
+    moved = archive_completed_requests(days, batch_size)
+    print(f"✅ Перенесено в архив: {moved} за {time.perf_counter() - started:.1f} с")
+
+@app.cli.command('db-info')
+def db_info_command():
+    """Фактические настройки подключения к базе данных"""
+    print_database_settings()
+
+# ========== ИМПОРТ ДАННЫХ ==========
+# flask --app app import-users users.csv
+# flask --app app import-requests requests.jsonl --batch-size 1000
+
+IMPORT_USER_ROLES = ('user', 'technician', 'admin')
+
+class ImportRejected(Exception):
+    """Строка файла импорта не прошла проверку"""
+
+def read_import_records(path):
+    """Построчное чтение JSONL или CSV: (номер строки, словарь полей)"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_no, record if isinstance(record, dict) else None
+
+def required_field(record, name, column=None, strip=True):
+    """Обязательное поле строки импорта; пароль (strip=False) берется как есть.
+
+    С column длина проверяется по String(n) столбца: иначе PostgreSQL прервал бы
+    импорт на середине, когда прошлые пачки уже записаны.
+    """
+    value = '' if record.get(name) is None else str(record[name])
+    if strip:
+        value = value.strip()
+    if not value:
+        raise ImportRejected(f'не заполнено поле {name}')
+    if column is not None and len(value) > column.type.length:
+        raise ImportRejected(f'поле {name} длиннее {column.type.length} символов')
+    return value
+
+def import_records(path, prepare_row, write_batch, batch_size):
+    """Общий цикл импорта: проверка строк и запись пачками фиксированного размера"""
+    started = time.perf_counter()
+    batch = []
+    imported = 0
+    rejected = []
+    
+    for line_no, record in read_import_records(path):
         try:
-            print("🔄 Создание таблиц базы данных...")
-            db.create_all()
-            print("✅ Таблицы базы данных созданы")
-            
-            # Создаем тестовых пользователей
-            create_default_users()
-            
-            # Создаем тестовые заявки
-            create_test_requests()
-            
-        except Exception as e:
-            print(f"❌ Ошибка при создании базы данных: {e}")
-    
-    # Запускаем приложение
-    print("\n" + "="*70)
-    print("🚀 СИСТЕМА РЕМОНТА КОМПЬЮТЕРОВ В КОЛЛЕДЖЕ")
-    print("="*70)
-    print("Сервер запущен!")
-    print("🌐 Откройте в браузере: http://localhost:5000")
+            if record is None:
+                raise ImportRejected('строка не разбирается')
+            batch.append(prepare_row(record))
+        except ImportRejected as e:
+            rejected.append((line_no, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            write_batch(batch)
+            db.session.commit()
+            imported += len(batch)
+            batch = []
+    
+    if batch:
+        write_batch(batch)
+        db.session.commit()
+        imported += len(batch)
+    
+    elapsed = time.perf_counter() - started
+    print(f"✅ Импортировано: {imported}")
+    print(f"❌ Отклонено: {len(rejected)}")
+    for line_no, reason in rejected[:20]:
+        print(f"   строка {line_no}: {reason}")
+    if len(rejected) > 20:
+        print(f"   ... и еще {len(rejected) - 20}")
+    print(f"⏱  {elapsed:.2f} с, {imported / elapsed if elapsed else 0:.0f} строк/с")
+
+@app.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Строк в одной пачке INSERT/UPDATE')
+def import_users_command(path, batch_size):
+    """Импорт пользователей из JSONL/CSV (username, password, role, full_name).
+
+    Существующие пользователи с тем же username обновляются.
+    """
+    # Все существующие имена одним запросом
+    existing = {username for username, in db.session.query(User.username)}
+    seen = set()
+    
+    def prepare_row(record):
+        row = {name: required_field(record, name, User.__table__.c[name]) for name in ('username', 'role', 'full_name')}
+        row['password'] = required_field(record, 'password', strip=False)
+        if row['role'] not in IMPORT_USER_ROLES:
+            raise ImportRejected(f"неизвестная роль {row['role']}")
+        error = user_validation_error(row['username'], row['password'])
+        if error:
+            raise ImportRejected(error)
+        if row['username'] in seen:
+            raise ImportRejected(f"повтор пользователя {row['username']}")
+        seen.add(row['username'])
+        return row
+    
+    user_table = User.__table__
+    update_user = user_table.update().where(user_table.c.username == db.bindparam('b_username')).values(
+        password=db.bindparam('password'), role=db.bindparam('role'), full_name=db.bindparam('full_name'))
+    
+    def write_batch(batch):
+        for row, password_hash in zip(batch, hash_passwords([row['password'] for row in batch])):
+            row['password'] = password_hash
+        new_rows = [row for row in batch if row['username'] not in existing]
+        updated_rows = [dict(row, b_username=row['username']) for row in batch if row['username'] in existing]
+        if new_rows:
+            now = datetime.utcnow()
+            db.session.execute(user_table.insert(), [dict(row, created_at=now) for row in new_rows])
+        if updated_rows:
+            db.session.execute(update_user, updated_rows)
+    
+    import_records(path, prepare_row, write_batch, batch_size)
+    invalidate_user_cache()
+
+@app.cli.command('import-requests')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='Строк в одной пачке INSERT')
+def import_requests_command(path, batch_size):
+    """Импорт заявок из JSONL/CSV.
+
+    Автор задается полем username или user_id; необязательные поля:
+    status, priority, created_at, updated_at (ISO).
+    """
+    # Первый проход: собираем ссылки на авторов и разрешаем их одним запросом
+    usernames = set()
+    user_ids = set()
+    for _, record in read_import_records(path):
+        if not record:
+            continue
+        if record.get('username'):
+            usernames.add(str(record['username']).strip())
+        elif str(record.get('user_id') or '').isdigit():
+            user_ids.add(int(record['user_id']))
+    
+    known_ids = set()
+    ids_by_username = {}
+    if usernames or user_ids:
+        for user_id, username in db.session.query(User.id, User.username).filter(
+                db.or_(User.username.in_(usernames), User.id.in_(user_ids))):
+            known_ids.add(user_id)
+            ids_by_username[username] = user_id
+    
+    def prepare_row(record):
+        if record.get('username'):
+            user_id = ids_by_username.get(str(record['username']).strip())
+        else:
+            user_id = int(record['user_id']) if str(record.get('user_id') or '').isdigit() else None
+        if user_id not in known_ids:
+            raise ImportRejected('автор не найден')
+        
+        status = record.get('status') or 'pending'
+        priority = record.get('priority') or 'medium'
+        if status not in REQUEST_STATUSES:
+            raise ImportRejected(f'неизвестный статус {status}')
+        if priority not in REQUEST_PRIORITIES:
+            raise ImportRejected(f'неизвестный приоритет {priority}')
+        
+        created_at = parse_datetime(record['created_at']) if record.get('created_at') else datetime.utcnow()
+        updated_at = parse_datetime(record['updated_at']) if record.get('updated_at') else created_at
+        if created_at is None or updated_at is None:
+            raise ImportRejected('дата не в формате ISO')
+        
+        computer_number = required_field(record, 'computer_number', RepairRequest.__table__.c.computer_number)
+        problem_description = required_field(record, 'problem_description')
+        return {
+            'user_id': user_id,
+            'computer_number': computer_number,
+            'location': required_field(record, 'location', RepairRequest.__table__.c.location),
+            'problem_description': problem_description,
+            'status': status,
+            'priority': priority,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            **duplicate_fields(computer_number, problem_description)
+        }
+    
+    def write_batch(batch):
+        db.session.execute(RepairRequest.__table__.insert(), batch)
+    
+    import_records(path, prepare_row, write_batch, batch_size)
+    # Счетчики статистики и история статусов пересчитываются один раз после всего импорта
+    rebuild_request_counters()
+    backfill_status_history()
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Пересчет дневных итогов отчетов по истории статусов"""
+    backfilled = backfill_status_history()
+    if not backfilled:
+        rebuild_status_rollups()
+    print(f"✅ Итоги пересчитаны (восстановлена история {backfilled} заявок)")
+
+@app.cli.command('assets-build')
+def assets_build_command():
+    """Статика с хэшем содержимого в именах и готовыми .gz/.br (шаг выкладки)"""
+    manifest = build_assets(app.static_folder, app.config['ASSETS_DIR'])
+    print(f"✅ Собрано файлов: {len(manifest)} в {app.config['ASSETS_DIR']}")
+    if brotli is None:
+        print("⚠️  brotli не установлен: собраны только .gz")
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Создание таблиц, новых столбцов и индексов, пересчет производных данных"""
+    db.create_all()
+    # create_all не добавляет новые столбцы и индексы в уже существующие таблицы
+    add_missing_columns(RepairRequest.__table__)
+    add_missing_columns(ArchivedRepairRequest.__table__)
+    for index in RepairRequest.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    ensure_search_index()
+    
+    # Счетчики, история статусов и ключи дублей для заявок прошлых версий
+    rebuild_request_counters()
+    backfill_status_history()
+    backfill_duplicate_keys()
+    print("✅ Схема базы данных обновлена")
+    print_database_settings()
+
+@app.cli.command('seed')
+def seed_command():
+    """Тестовые пользователи и заявки для разработки"""
+    create_default_users()
+    create_test_requests()
+    rebuild_request_counters()
+    backfill_status_history()
+    backfill_duplicate_keys()
+    
     print("\n📋 ДАННЫЕ ДЛЯ ВХОДА:")
     print("-" * 40)
-    print("👑 Администратор:")
-    print("   Логин: admin")
-    print("   Пароль: admin123")
-    print("\n🔧 Специалист по ремонту:")
-    print("   Логин: technician1")
-    print("   Пароль: tech123")
-    print("\n👤 Пользователи:")
-    print("   Логин: student1 / Пароль: student123")
-    print("   Логин: student2 / Пароль: student123")
-    print("   Логин: teacher1 / Пароль: teacher123")
-    print("\n📱 Возможности специалиста:")
-    print("   • Просмотр всех заявок")
-    print("   • Изменение статуса заявок")
-    print("   • Панель 'Мои задачи'")
-    print("   • Не может создавать пользователей")
-    print("="*70 + "\n")
-    
-    app.run(debug=True, port=5000, use_reloader=True)
\ No newline at end of file
+    print("👑 Администратор: admin / admin123")
+    print("🔧 Специалист: technician1 / tech123")
+    print("👤 Пользователи: student1 / student123, student2 / student123, teacher1 / teacher123")
+
+def gunicorn_post_fork(server, worker):
+    """Настройка процесса gunicorn после fork из мастера"""
+    # Соединения, открытые мастером до fork, нельзя делить между процессами
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    # Потоки не переживают fork, поэтому обработчики задач запускаются в каждом процессе
+    job_worker.start(app.config['JOBS_WORKERS'])
+
+@app.cli.command('serve')
+@click.option('--bind', default=None, help='Адрес:порт (по умолчанию SERVE_BIND)')
+@click.option('--workers', type=int, default=None, help='Процессов (по умолчанию SERVE_WORKERS)')
+@click.option('--threads', type=int, default=None, help='Потоков в процессе (по умолчанию SERVE_THREADS)')
+def serve_command(bind, workers, threads):
+    """Рабочий сервер: процессы gunicorn с предзагруженным приложением.
+
+    Приложение импортируется один раз в мастере и передается процессам через fork.
+    flask reload - замена кода без разрыва соединений, kill -HUP <мастер> - плавный
+    перезапуск процессов, kill -TERM <мастер> - остановка после текущих запросов.
+    Схема не создается при запуске: перед первым запуском выполните flask migrate.
+    
+    Открытая панель специалиста (SSE) держит поток, поэтому в каждом процессе их не
+    больше EVENTS_MAX_SUBSCRIBERS (по умолчанию половина потоков), остальные получают 503
+    и переподключаются позже. Для N одновременных панелей нужно SERVE_THREADS > 2N.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+        from gunicorn.arbiter import Arbiter
+    except ImportError:
+        raise click.ClickException('Для flask serve нужен gunicorn (Linux/macOS): pip install gunicorn')
+    missing = missing_tables()
+    if missing:
+        raise click.ClickException(f"В базе нет таблиц {', '.join(missing)}: выполните flask --app app migrate")
+    workers = workers or app.config['SERVE_WORKERS']
+    if workers > 1 and not app.config['EVENTS_BROKER_URL']:
+        # Без общего брокера клиент SSE получает только события своего процесса
+        raise click.ClickException(f"{workers} процессов без EVENTS_BROKER_URL: клиенты не увидят события "
+                                   "из других процессов. Задайте EVENTS_BROKER_URL=postgresql://... или --workers 1")
+    threads = threads or app.config['SERVE_THREADS']
+    # Потоки SSE не должны занять все потоки процесса, даже если --threads меньше SERVE_THREADS
+    event_broker.max_subscribers = min(event_broker.max_subscribers, threads // 2)
+    print_database_settings()
+    print(f"🧵 {workers} x {threads} потоков, панелей SSE на процесс: до {event_broker.max_subscribers}")
+    
+    os.makedirs(os.path.dirname(app.config['SERVE_PIDFILE']), exist_ok=True)
+    options = {
+        'bind': bind or app.config['SERVE_BIND'],
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': app.config['SERVE_TIMEOUT'],
+        'graceful_timeout': app.config['SERVE_GRACEFUL_TIMEOUT'],
+        'pidfile': app.config['SERVE_PIDFILE'],
+        'post_fork': gunicorn_post_fork,
+    }
+    
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return app
+    
+    arbiter = Arbiter(Server())
+    # При python -m flask файл flask/__main__.py нельзя запустить напрямую:
+    # новый мастер по USR2 тоже запускается через -m
+    main_spec = getattr(sys.modules['__main__'], '__spec__', None)
+    if main_spec is not None:
+        arbiter.START_CTX['args'] = [sys.executable, '-m', main_spec.name.removesuffix('.__main__')] + sys.argv[1:]
+    arbiter.run()
+
+@app.cli.command('reload')
+def reload_command():
+    """Замена кода работающего flask serve без разрыва соединений.
+
+    Мастер по USR2 запускает новый мастер с текущим кодом на тех же сокетах.
+    Новый мастер пишет pid в <SERVE_PIDFILE>.2 после загрузки приложения;
+    тогда старый мастер получает TERM и завершает свои запросы.
+    """
+    import signal
+    
+    def read_pid(path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+    
+    pidfile = app.config['SERVE_PIDFILE']
+    old_pid = read_pid(pidfile)
+    if old_pid is None:
+        raise click.ClickException(f"Сервер не запущен: нет {pidfile}")
+    os.kill(old_pid, signal.SIGUSR2)
+    deadline = time.monotonic() + app.config['SERVE_TIMEOUT']
+    while read_pid(pidfile + '.2') is None:
+        if time.monotonic() > deadline:
+            raise click.ClickException('Новый мастер не запустился, работает прежний код')
+        time.sleep(0.2)
+    os.kill(old_pid, signal.SIGTERM)
+    print(f"✅ Новый мастер {read_pid(pidfile + '.2')}, прежний {old_pid} завершает текущие запросы")
+
+if __name__ == '__main__':
+    # Сервер разработки с перезагрузкой; рабочий запуск - flask --app app serve
+    with app.app_context():
+        if missing_tables():
+            print("❌ База данных не создана или не обновлена. Выполните:")
+            print("   flask --app app migrate")
+            print("   flask --app app seed    # тестовые пользователи и заявки")
+            raise SystemExit(1)
+        print_database_settings()
+    
+    # Обработчики фоновых задач - только в рабочем процессе перезагрузчика
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_worker.start(app.config['JOBS_WORKERS'])
+    
+    app.run(debug=True, port=5000, use_reloader=True)
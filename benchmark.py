@@ -0,0 +1,797 @@
+"""
+Замеры производительности системы ремонта компьютеров
+
+Каждый замер создает временную базу SQLite, заполняет ее синтетическими
+данными и печатает результаты в формате JSON:
+
+    python benchmark.py routes --rows 200000 --users 5000 --concurrency 8
+    python benchmark.py routes --server --output after.json --compare before.json
+    python benchmark.py search --rows 100000
+    python benchmark.py login --concurrency 50
+    python benchmark.py writes --concurrency 8 --rows 0
+    python benchmark.py claims --concurrency 20 --repeat 50
+    python benchmark.py startup --rows 10000 --repeat 5
+    python benchmark.py assets --rows 10000
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+LOCATIONS = ['Аудитория 301', 'Аудитория 305', 'Компьютерный класс №1', 'Компьютерный класс №2',
+             'Библиотека', 'Кабинет информатики', 'Лаборатория 12', 'Читальный зал']
+PROBLEMS = ['Не включается компьютер', 'Медленно работает система', 'Не работает Wi-Fi адаптер',
+            'Не работает проектор', 'Синий экран при загрузке', 'Не печатает принтер',
+            'Сломана клавиатура', 'Нет звука в наушниках', 'Мерцает монитор', 'Не открывается браузер']
+DETAILS = ['после обновления', 'при нажатии кнопки питания', 'с утра', 'во время занятия',
+           'уже третий день', 'периодически', 'после перезагрузки', 'на всех учетных записях']
+
+
+def create_app_database(path):
+    """Импорт приложения с базой во временном файле"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    import app as application
+    with application.app.app_context():
+        application.db.create_all()
+        application.ensure_search_index()
+    return application
+
+
+def seed_database(application, rows, users, batch_size=5000):
+    """Синтетические пользователи и заявки пачками INSERT"""
+    from datetime import datetime, timedelta
+    
+    rng = random.Random(42)
+    app, db = application.app, application.db
+    with app.app_context():
+        # Один хэш на всех: стоимость проверки та же, а заполнение не тратит минуты на PBKDF2
+        password_hash = application.hash_password('password')
+        # user0 - администратор, около 1% - специалисты, остальные - обычные пользователи
+        technicians = max(1, users // 100)
+        db.session.execute(application.User.__table__.insert(), [
+            {'username': f'user{i}', 'password': password_hash,
+             'role': 'admin' if i == 0 else 'technician' if i <= technicians else 'user',
+             'full_name': f'Пользователь {i}', 'created_at': datetime.utcnow()}
+            for i in range(users)
+        ])
+        
+        started = datetime.utcnow() - timedelta(days=365)
+        batch = []
+        for i in range(rows):
+            created_at = started + timedelta(minutes=rng.randrange(365 * 24 * 60))
+            batch.append({
+                'user_id': rng.randrange(users) + 1,
+                'computer_number': f'PC-{rng.randrange(1, 500)}',
+                'location': rng.choice(LOCATIONS),
+                'problem_description': f'{rng.choice(PROBLEMS)} {rng.choice(DETAILS)}.',
+                'status': rng.choices(application.REQUEST_STATUSES, weights=[15, 10, 75])[0],
+                'priority': rng.choices(application.REQUEST_PRIORITIES, weights=[30, 50, 20])[0],
+                'created_at': created_at,
+                'updated_at': created_at
+            })
+            if len(batch) == batch_size:
+                db.session.execute(application.RepairRequest.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(application.RepairRequest.__table__.insert(), batch)
+        db.session.commit()
+        application.rebuild_request_counters()
+
+
+def percentiles(samples):
+    """p50/p95/p99 и среднее в миллисекундах"""
+    ordered = sorted(samples)
+    
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+    
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'mean': round(statistics.mean(ordered) * 1000, 3), 'count': len(ordered)}
+
+
+def bench_search(args, application):
+    """Поиск FTS5 против LIKE '%...%' по всей таблице заявок"""
+    queries = ['PC-205', 'проектор', 'синий экран', 'wi-fi', 'Библиотека', 'после обновления']
+    results = {}
+    with application.app.app_context():
+        for backend in ('fts5', 'like'):
+            samples = []
+            for _ in range(args.repeat):
+                for text in queries:
+                    started = time.perf_counter()
+                    application.search_requests(text, per_page=20, backend=backend)
+                    samples.append(time.perf_counter() - started)
+            results[backend] = percentiles(samples)
+    return results
+
+
+def run_concurrently(concurrency, rounds, action):
+    """Запуск action(поток, номер) в concurrency потоках одновременно; время каждого вызова"""
+    samples = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency)
+    
+    def worker(index):
+        barrier.wait()
+        for round_number in range(rounds):
+            started = time.perf_counter()
+            action(index, round_number)
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed)
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def bench_login(args, application):
+    """Одновременные входы: задержка POST /login при проверке PBKDF2 в пуле"""
+    app = application.app
+    clients = [app.test_client() for _ in range(args.concurrency)]
+    
+    def login(index, round_number):
+        response = clients[index].post('/login', data={
+            'username': f'user{(index * args.repeat + round_number) % args.users}', 'password': 'password'})
+        assert response.status_code == 302, response.status_code
+    
+    samples, elapsed = run_concurrently(args.concurrency, args.repeat, login)
+    return {
+        'concurrency': args.concurrency,
+        'iterations': app.config['PASSWORD_HASH_ITERATIONS'],
+        'pool_size': app.config['PASSWORD_POOL_SIZE'],
+        'latency_ms': percentiles(samples),
+        'logins_per_second': round(len(samples) / elapsed, 1)
+    }
+
+
+class TestClientTransport:
+    """Запросы через тестовый клиент Flask, без сети"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+    
+    def request(self, method, path, cookie=None, data=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client(use_cookies=False)
+        headers = {'Cookie': cookie} if cookie else {}
+        response = self.local.client.open(path, method=method, headers=headers, data=data)
+        response.close()
+        return response.status_code
+
+
+class HttpTransport:
+    """Запросы по HTTP к локальному многопоточному WSGI-серверу"""
+    
+    def __init__(self, app):
+        from urllib.parse import urlencode
+        from werkzeug.serving import make_server
+        
+        self.urlencode = urlencode
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def request(self, method, path, cookie=None, data=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        headers = {'Cookie': cookie} if cookie else {}
+        body = None
+        if data is not None:
+            body = self.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+    
+    def close(self):
+        self.server.shutdown()
+
+
+def session_cookie(application, username):
+    """Cookie сессии пользователя после входа через тестовый клиент"""
+    client = application.app.test_client()
+    client.post('/login', data={'username': username, 'password': 'password'})
+    return f"session={client.get_cookie('session').value}"
+
+
+def count_queries(application, action):
+    """Число SQL-запросов, выполненных action() в текущем потоке"""
+    from sqlalchemy import event
+    
+    with application.app.app_context():
+        engine = application.db.engine
+    statements = []
+    
+    def on_execute(*args):
+        statements.append(1)
+    
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return len(statements)
+
+
+def bench_routes(args, application):
+    """Задержка, пропускная способность и число SQL-запросов по основным маршрутам"""
+    rng = random.Random(7)
+    admin = session_cookie(application, 'user0')
+    technician = session_cookie(application, 'user1')
+    
+    # Маршрут: (метод, путь, cookie, функция данных формы)
+    routes = {
+        'login': ('POST', '/login', None,
+                  lambda: {'username': f'user{rng.randrange(args.users)}', 'password': 'password'}),
+        'dashboard': ('GET', '/dashboard', admin, None),
+        'requests': ('GET', '/requests', admin, None),
+        'api_requests': ('GET', '/api/requests', admin, None),
+        'technician_tasks': ('GET', '/technician/tasks', technician, None),
+        'update_request_status': ('POST', None, technician,
+                                  lambda: {'status': rng.choice(application.REQUEST_STATUSES)}),
+    }
+    
+    def path_for(name, path):
+        if name == 'update_request_status':
+            return f'/requests/{rng.randrange(1, args.rows + 1)}/update_status'
+        return path
+    
+    transport = HttpTransport(application.app) if args.server else TestClientTransport(application.app)
+    sql_client = TestClientTransport(application.app)
+    results = {}
+    try:
+        for name, (method, path, cookie, make_data) in routes.items():
+            # Число запросов к БД - по одному вызову в этом потоке через тестовый клиент
+            sql_queries = count_queries(application, lambda: sql_client.request(
+                method, path_for(name, path), cookie, make_data() if make_data else None))
+            
+            errors = []
+            
+            def call(index, round_number):
+                status = transport.request(method, path_for(name, path), cookie, make_data() if make_data else None)
+                if status >= 400:
+                    errors.append(status)
+            
+            samples, elapsed = run_concurrently(args.concurrency, args.repeat, call)
+            results[name] = {
+                'latency_ms': percentiles(samples),
+                'requests_per_second': round(len(samples) / elapsed, 1),
+                'sql_queries': sql_queries,
+                'errors': len(errors)
+            }
+            print(f"{name}: p50 {results[name]['latency_ms']['p50']} мс, "
+                  f"{results[name]['requests_per_second']} запр/с, SQL {sql_queries}", file=sys.stderr)
+    finally:
+        if args.server:
+            transport.close()
+    
+    return {
+        'transport': 'http' if args.server else 'test_client',
+        'concurrency': args.concurrency,
+        'users': args.users,
+        'routes': results
+    }
+
+
+def compare_results(current, baseline):
+    """Изменение p50/p95 и пропускной способности относительно прошлого прогона"""
+    changes = {}
+    for name, result in current.get('routes', {}).items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: f"{(result['latency_ms'][metric] / before['latency_ms'][metric] - 1) * 100:+.1f}%"
+            for metric in ('p50', 'p95') if before['latency_ms'][metric]
+        }
+        changes[name]['sql_queries'] = result['sql_queries'] - before['sql_queries']
+    return changes
+
+
+def bench_writes(args, application):
+    """Параллельные записи в SQLite: настройки по умолчанию против SQLITE_PRAGMAS.
+
+    Каждый писатель в своей транзакции добавляет заявку и меняет счетчик
+    статистики - как create_request. Для каждого варианта - отдельный файл БД.
+    """
+    from datetime import datetime
+    from sqlalchemy import create_engine, event, exc
+    
+    request_table = application.RepairRequest.__table__
+    counter_table = application.RequestCounter.__table__
+    results = {}
+    
+    for variant in ('default', 'tuned'):
+        path = os.path.join(os.path.dirname(args.database), f'writes-{variant}.db')
+        engine = create_engine(f'sqlite:///{path}', pool_size=args.concurrency)
+        if variant == 'tuned':
+            event.listen(engine, 'connect', application.configure_sqlite_connection)
+        application.db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(counter_table.insert().values(status='pending', priority='medium', location='A', count=0))
+        
+        errors = []
+        
+        def write(index, round_number):
+            try:
+                with engine.begin() as connection:
+                    now = datetime.utcnow()
+                    connection.execute(request_table.insert().values(
+                        user_id=1, computer_number=f'PC-{index}', location='A', problem_description='Тест',
+                        status='pending', priority='medium', created_at=now, updated_at=now))
+                    connection.execute(counter_table.update().values(count=counter_table.c.count + 1))
+            except exc.OperationalError as e:
+                errors.append(str(e.orig))
+        
+        samples, elapsed = run_concurrently(args.concurrency, args.repeat, write)
+        results[variant] = {
+            'latency_ms': percentiles(samples),
+            'commits_per_second': round((len(samples) - len(errors)) / elapsed, 1),
+            'errors': len(errors)
+        }
+        engine.dispose()
+    
+    return {'concurrency': args.concurrency, 'pragmas': application.app.config['SQLITE_PRAGMAS'], **results}
+
+
+def bench_templates(args, application):
+    """Отрисовка длинных списков без кэша фрагментов и с заполненным кэшем"""
+    cache = application.fragment_cache
+    client = TestClientTransport(application.app)
+    admin = session_cookie(application, 'user0')
+    technician = session_cookie(application, 'user1')
+    pages = {
+        'requests': (f"/requests?limit={application.app.config['REQUESTS_PAGE_SIZE_MAX']}", admin),
+        'technician_tasks': ('/technician/tasks', technician),
+    }
+    max_entries = cache.max_entries
+    results = {}
+    try:
+        for name, (path, cookie) in pages.items():
+            results[name] = {}
+            for mode in ('uncached', 'cached'):
+                cache.max_entries = 0 if mode == 'uncached' else max_entries
+                cache.clear()
+                client.request('GET', path, cookie)
+                hits, misses = cache.hits, cache.misses
+                samples = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    client.request('GET', path, cookie)
+                    samples.append(time.perf_counter() - started)
+                lookups = cache.hits - hits + cache.misses - misses
+                results[name][mode] = {
+                    'latency_ms': percentiles(samples),
+                    'hit_ratio': round((cache.hits - hits) / lookups, 3) if lookups else None
+                }
+    finally:
+        cache.max_entries = max_entries
+    return results
+
+
+def bench_reports(args, application):
+    """Годовой отчет о времени ремонта: дневные итоги против разбора всей истории статусов"""
+    from datetime import datetime, timedelta
+    
+    rng = random.Random(11)
+    app, db = application.app, application.db
+    transitions = application.StatusTransition.__table__
+    with app.app_context():
+        # История: создание, затем через случайное время работа и завершение
+        batch = []
+        for request_id, status, created_at in db.session.query(
+                application.RepairRequest.id, application.RepairRequest.status, application.RepairRequest.created_at):
+            batch.append({'request_id': request_id, 'from_status': None, 'to_status': 'pending', 'changed_at': created_at})
+            started_at = created_at + timedelta(minutes=rng.expovariate(1 / 240))
+            if status != 'pending':
+                batch.append({'request_id': request_id, 'from_status': 'pending', 'to_status': 'in_progress',
+                              'changed_at': started_at})
+            if status == 'completed':
+                batch.append({'request_id': request_id, 'from_status': 'in_progress', 'to_status': 'completed',
+                              'changed_at': started_at + timedelta(minutes=rng.expovariate(1 / 1440))})
+            if len(batch) >= 5000:
+                db.session.execute(transitions.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(transitions.insert(), batch)
+        db.session.commit()
+        
+        started = time.perf_counter()
+        application.rebuild_status_rollups()
+        rebuild_seconds = time.perf_counter() - started
+        
+        date_to = datetime.utcnow().date()
+        date_from = date_to - timedelta(days=365)
+        
+        def from_history():
+            # То же без итогов: все переходы за год с временем от создания заявки
+            rows = db.session.execute(
+                db.select(application.RepairRequest.location, transitions.c.to_status,
+                          transitions.c.changed_at, application.RepairRequest.created_at)
+                .join(application.RepairRequest, application.RepairRequest.id == transitions.c.request_id)
+                .where(transitions.c.changed_at >= date_from)
+            ).all()
+            durations = {}
+            for location, to_status, changed_at, created_at in rows:
+                durations.setdefault((location, to_status), []).append((changed_at - created_at).total_seconds())
+            return {key: sorted(values)[len(values) // 2] for key, values in durations.items()}
+        
+        results = {'rebuild_seconds': round(rebuild_seconds, 2),
+                   'transitions': db.session.query(db.func.count()).select_from(transitions).scalar()}
+        for name, action in (('rollups', lambda: application.get_resolution_report(date_from, date_to, 'location')),
+                             ('history_scan', from_history)):
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                action()
+                samples.append(time.perf_counter() - started)
+            results[name] = percentiles(samples)
+    return results
+
+
+def bench_duplicates(args, application):
+    """Проверка на дубли при создании заявки: подпись описания и поиск по открытым заявкам"""
+    rng = random.Random(5)
+    app, db = application.app, application.db
+    with app.app_context():
+        started = time.perf_counter()
+        application.backfill_duplicate_keys()
+        backfill_seconds = time.perf_counter() - started
+        open_requests = db.session.query(application.RepairRequest).filter(
+            application.RepairRequest.status != 'completed').count()
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM repair_request WHERE computer_key = 'PC1' "
+            "AND status != 'completed' ORDER BY created_at DESC LIMIT 200")).all()
+        
+        signature_samples = []
+        lookup_samples = []
+        found = 0
+        for _ in range(args.repeat * 10):
+            # Описание того же вида, что у существующих заявок, но в другой формулировке
+            description = f'{rng.choice(DETAILS)} {rng.choice(PROBLEMS).lower()}'
+            computer_number = f'pc {rng.randrange(1, 500)}'
+            application.description_signature.cache_clear()
+            started = time.perf_counter()
+            fields = application.duplicate_fields(computer_number, description)
+            signature_samples.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            found += bool(application.find_duplicates(fields))
+            lookup_samples.append(time.perf_counter() - started)
+    
+    return {
+        'open_requests': open_requests,
+        'backfill_seconds': round(backfill_seconds, 2),
+        'query_plan': [row[-1] for row in plan],
+        'signature_ms': percentiles(signature_samples),
+        'lookup_ms': percentiles(lookup_samples),
+        'with_duplicates': round(found / len(lookup_samples), 3)
+    }
+
+
+def bench_archive(args, application):
+    """Списки до и после переноса старых завершенных заявок в архив"""
+    app, db = application.app, application.db
+    client = TestClientTransport(app)
+    admin = session_cookie(application, 'user0')
+    # Заявки в базе созданы за последний год и не менялись, поэтому возраст считается от created_at
+    paths = {
+        'requests': '/requests',
+        'requests_completed': '/requests?status=completed',
+        'api_requests': '/api/requests',
+        'api_requests_location': '/api/requests?location=%D0%91%D0%B8%D0%B1%D0%BB%D0%B8%D0%BE%D1%82%D0%B5%D0%BA%D0%B0',
+    }
+    
+    def measure():
+        application.fragment_cache.clear()
+        results = {}
+        for name, path in paths.items():
+            client.request('GET', path, admin)
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                client.request('GET', path, admin)
+                samples.append(time.perf_counter() - started)
+            results[name] = percentiles(samples)
+        return results
+    
+    before = measure()
+    with app.app_context():
+        started = time.perf_counter()
+        moved = application.archive_completed_requests(older_than_days=30)
+        archive_seconds = time.perf_counter() - started
+        hot = db.session.query(application.RepairRequest).count()
+    after = measure()
+    
+    return {
+        'archived': moved,
+        'hot_rows': hot,
+        'archive_seconds': round(archive_seconds, 2),
+        'before_ms': before,
+        'after_ms': after
+    }
+
+
+def bench_claims(args, application):
+    """Одновременный захват заявок специалистами через /api/tasks/claim.
+
+    Каждый поток - отдельный специалист со своим клиентом. Проверяется, что
+    ни одна заявка не выдана дважды, и считаются захваты в секунду.
+    """
+    from sqlalchemy import func
+    
+    app, db = application.app, application.db
+    RepairRequest, StatusTransition = application.RepairRequest, application.StatusTransition
+    technicians = max(1, args.users // 100)
+    cookies = [session_cookie(application, f'user{1 + index % technicians}') for index in range(args.concurrency)]
+    with app.app_context():
+        pending = db.session.query(RepairRequest).filter(RepairRequest.status == 'pending').count()
+    
+    claimed = []
+    statuses = {}
+    lock = threading.Lock()
+    local = threading.local()
+    
+    def claim(index, round_number):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client(use_cookies=False)
+        response = local.client.post('/api/tasks/claim', headers={'Cookie': cookies[index]})
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                data = response.get_json()['request']
+                claimed.append((data['id'], data['priority']))
+        response.close()
+    
+    samples, elapsed = run_concurrently(args.concurrency, args.repeat, claim)
+    
+    with app.app_context():
+        # В заполненной базе истории нет: каждый переход pending -> in_progress сделан захватом
+        repeated = db.session.query(StatusTransition.request_id).filter(
+            StatusTransition.to_status == 'in_progress'
+        ).group_by(StatusTransition.request_id).having(func.count() > 1).count()
+        assigned = db.session.query(RepairRequest).filter(
+            RepairRequest.id.in_([request_id for request_id, _ in claimed]),
+            RepairRequest.status == 'in_progress', RepairRequest.assignee_id.isnot(None)
+        ).count() if claimed else 0
+        counters = dict(db.session.query(application.RequestCounter.status, func.sum(application.RequestCounter.count))
+                        .group_by(application.RequestCounter.status).all())
+        left = db.session.query(RepairRequest).filter(RepairRequest.status == 'pending').count()
+    
+    by_priority = {}
+    for _, priority in claimed:
+        by_priority[priority] = by_priority.get(priority, 0) + 1
+    double_assignments = len(claimed) - len({request_id for request_id, _ in claimed})
+    errors = []
+    if double_assignments:
+        errors.append(f'Заявки выданы дважды: {double_assignments}')
+    if repeated:
+        errors.append(f'Повторные переходы в работу: {repeated}')
+    return {
+        'concurrency': args.concurrency,
+        'pending_before': pending,
+        'claims': len(claimed),
+        'by_priority': by_priority,
+        'responses': statuses,
+        'double_assignments': double_assignments,
+        'repeated_transitions': repeated,
+        'assigned_in_db': assigned,
+        'pending_counter_matches': counters.get('pending', 0) == left,
+        'claims_per_second': round(len(claimed) / elapsed, 1),
+        'latency_ms': percentiles(samples),
+        'errors': errors
+    }
+
+
+def bench_startup(args, application):
+    """Холодный запуск: от старта процесса до первого 200 на /login.
+
+    import - только импорт модуля app, serve - flask serve с предзагрузкой
+    приложения до ответа первого процесса gunicorn.
+    """
+    directory = os.path.dirname(os.path.abspath(application.__file__))
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{args.database}',
+               SERVE_PIDFILE=os.path.join(os.path.dirname(args.database), 'gunicorn.pid'))
+    
+    def first_login(port):
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/login')
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                if response.status == 200:
+                    return
+            except OSError:
+                time.sleep(0.005)
+    
+    import_samples = []
+    serve_samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=directory, env=env, check=True)
+        import_samples.append(time.perf_counter() - started)
+        
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        started = time.perf_counter()
+        server = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--bind', f'127.0.0.1:{port}'],
+                                  cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            first_login(port)
+            serve_samples.append(time.perf_counter() - started)
+        finally:
+            server.terminate()
+            server.wait()
+    
+    return {
+        'workers': application.app.config['SERVE_WORKERS'],
+        'import_ms': percentiles(import_samples),
+        'serve_first_login_ms': percentiles(serve_samples)
+    }
+
+
+def bench_assets(args, application):
+    """Байты на проводе при первом и повторном заходе на страницы.
+
+    before - статика без хэша в имени (браузер перепроверяет ее на каждой
+    странице) и ответы без сжатия; after - flask assets-build и сжатие.
+    """
+    app = application.app
+    client = app.test_client(use_cookies=False)
+    cookies = {'admin': session_cookie(application, 'user0'), 'technician': session_cookie(application, 'user1')}
+    pages = [('/login', None), ('/dashboard', 'admin'), ('/requests', 'admin'),
+             ('/technician/tasks', 'technician'), ('/api/requests', 'admin')]
+    
+    def wire_size(response):
+        headers = sum(len(f'{name}: {value}\r\n') for name, value in response.headers.items())
+        return len(f'HTTP/1.1 {response.status}\r\n\r\n') + headers + len(response.get_data())
+    
+    def decoded(response):
+        data = response.get_data()
+        if response.headers.get('Content-Encoding') == 'br':
+            return application.brotli.decompress(data)
+        if response.headers.get('Content-Encoding') == 'gzip':
+            return gzip.decompress(data)
+        return data
+    
+    def visit():
+        """Проход по страницам дважды с кэшем браузера: url -> (ETag, immutable)"""
+        cache = {}
+        result = {}
+        for view in ('first_visit', 'repeat_visit'):
+            sent = requests = 0
+            by_path = {}
+            for path, user in pages:
+                headers = {'Accept-Encoding': 'gzip, deflate, br'}
+                if user:
+                    headers['Cookie'] = cookies[user]
+                response = client.get(path, headers=headers)
+                by_path[path] = wire_size(response)
+                sent += by_path[path]
+                requests += 1
+                for url in re.findall(r'(?:href|src)="(/static/[^"]+)"', decoded(response).decode('utf-8')):
+                    etag, immutable = cache.get(url, (None, False))
+                    if immutable:
+                        continue
+                    static_headers = {'Accept-Encoding': 'gzip, deflate, br'}
+                    if etag:
+                        static_headers['If-None-Match'] = etag
+                    static = client.get(url, headers=static_headers)
+                    sent += wire_size(static)
+                    requests += 1
+                    by_path[url] = by_path.get(url, 0) + wire_size(static)
+                    if static.status_code == 200:
+                        cache[url] = (static.headers.get('ETag'), static.cache_control.immutable)
+                    static.close()
+                response.close()
+            result[view] = {'bytes': sent, 'requests': requests, 'by_path': by_path}
+        return result
+    
+    def page_latency():
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            client.get('/requests', headers={'Accept-Encoding': 'gzip, deflate, br', 'Cookie': cookies['admin']}).close()
+            samples.append(time.perf_counter() - started)
+        return percentiles(samples)
+    
+    config = app.config
+    assets_dir, min_size = config['ASSETS_DIR'], config['COMPRESS_MIN_SIZE']
+    results = {}
+    try:
+        config['ASSETS_DIR'] = os.path.join(os.path.dirname(args.database), 'no-assets')
+        config['COMPRESS_MIN_SIZE'] = float('inf')
+        application.asset_manifest.cache_clear()
+        application.fingerprinted_assets.cache_clear()
+        results['before'] = visit()
+        results['before']['requests_page_ms'] = page_latency()
+        
+        config['ASSETS_DIR'] = os.path.join(os.path.dirname(args.database), 'assets')
+        config['COMPRESS_MIN_SIZE'] = min_size
+        application.build_assets(app.static_folder, config['ASSETS_DIR'])
+        results['after'] = visit()
+        results['after']['requests_page_ms'] = page_latency()
+    finally:
+        config['ASSETS_DIR'], config['COMPRESS_MIN_SIZE'] = assets_dir, min_size
+        application.asset_manifest.cache_clear()
+        application.fingerprinted_assets.cache_clear()
+    
+    for view in ('first_visit', 'repeat_visit'):
+        before, after = results['before'][view]['bytes'], results['after'][view]['bytes']
+        results[f'{view}_saved_percent'] = round((before - after) / before * 100, 1)
+    results['brotli'] = application.brotli is not None
+    return results
+
+
+BENCHMARKS = {
+    'archive': bench_archive,
+    'assets': bench_assets,
+    'claims': bench_claims,
+    'duplicates': bench_duplicates,
+    'login': bench_login,
+    'routes': bench_routes,
+    'writes': bench_writes,
+    'reports': bench_reports,
+    'search': bench_search,
+    'startup': bench_startup,
+    'templates': bench_templates,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры производительности')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rows', type=int, default=100000, help='Число заявок в базе')
+    parser.add_argument('--users', type=int, default=1000, help='Число пользователей в базе')
+    parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого замера')
+    parser.add_argument('--concurrency', type=int, default=50, help='Одновременных клиентов')
+    parser.add_argument('--server', action='store_true', help='Запросы по HTTP к локальному WSGI-серверу')
+    parser.add_argument('--output', help='Сохранить результат в JSON-файл')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        args.database = os.path.join(directory, 'benchmark.db')
+        application = create_app_database(args.database)
+        started = time.perf_counter()
+        seed_database(application, args.rows, args.users)
+        print(f'Заполнение базы: {time.perf_counter() - started:.1f} с', file=sys.stderr)
+        
+        result = BENCHMARKS[args.benchmark](args, application)
+    
+    report = {'benchmark': args.benchmark, 'rows': args.rows, 'results': result}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['compared_to'] = {'file': args.compare,
+                                     'changes': compare_results(result, json.load(f)['results'])}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    # Замер с проверкой корректности (claims) завершается с ошибкой, если она нарушена
+    if result.get('errors'):
+        raise SystemExit('\n'.join(result['errors']))
+
+
+if __name__ == '__main__':
+    main()
@@ -23,7 +23,7 @@ if os.path.exists(db_file):
 
 # Импортируем app для создания базы данных
 try:
-    from app import app, db, User, RepairRequest
+    from app import app, db, User, RepairRequest, hash_password
     
     with app.app_context():
         # Создаем таблицы
@@ -33,14 +33,14 @@ try:
         # Создаем тестовых пользователей
         admin = User(
             username='admin',
-            password='admin123',
+            password=hash_password('admin123'),
             role='admin',
             full_name='Администратор'
         )
         
         student1 = User(
             username='student1',
-            password='student123',
+            password=hash_password('student123'),
             role='user',
             full_name='Иванов Иван'
         )
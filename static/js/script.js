@@ -1,15 +1,9 @@
-// Функция фильтрации заявок по статусу
+// Фильтрация заявок выполняется на сервере - отправляем форму фильтров
 function filterRequests() {
-    const filter = document.getElementById('statusFilter').value;
-    const rows = document.querySelectorAll('.request-row');
-    
-    rows.forEach(row => {
-        if (filter === 'all' || row.classList.contains(`status-${filter}`)) {
-            row.style.display = '';
-        } else {
-            row.style.display = 'none';
-        }
-    });
+    const form = document.getElementById('filtersForm');
+    if (form) {
+        form.submit();
+    }
 }
 
 // Обновление времени в реальном времени
@@ -31,13 +25,149 @@ function updateDateTime() {
     }
 }
 
-// Загрузка заявок через AJAX (опционально)
+// Интервал опроса изменений заявок (мс)
+const POLL_INTERVAL = 5000;
+
+const STATUS_NAMES = {
+    pending: 'Ожидание',
+    in_progress: 'В работе',
+    completed: 'Завершено'
+};
+
+// Отметка последнего изменения и ETag последнего ответа
+let requestsWatermark = null;
+let requestsEtag = null;
+
+// Опрос изменений заявок с фильтрами текущей страницы; первая отметка приходит в разметке
 function loadRequests() {
-    fetch('/api/requests')
-        .then(response => response.json())
+    const params = new URLSearchParams(window.location.search);
+    params.set('since', requestsWatermark);
+    const headers = requestsEtag ? { 'If-None-Match': requestsEtag } : {};
+    
+    fetch(`/api/requests?${params}`, { headers: headers, cache: 'no-cache' })
+        .then(response => {
+            // 304 - с прошлого опроса ничего не изменилось
+            if (response.status === 304) {
+                return null;
+            }
+            requestsEtag = response.headers.get('ETag');
+            return response.json();
+        })
         .then(data => {
-            console.log('Заявки загружены:', data);
-            // Здесь можно обновить таблицу через JavaScript
+            if (!data) {
+                return;
+            }
+            applyRequestChanges(data.requests);
+            requestsWatermark = data.watermark;
+            if (data.has_more) {
+                loadRequests();
+            }
+        })
+        .catch(error => console.error('Ошибка:', error));
+}
+
+// Обновление статуса уже показанных заявок без перезагрузки страницы
+function applyRequestChanges(changes) {
+    changes.forEach(req => {
+        const row = document.querySelector(`.request-row[data-id="${req.id}"]`);
+        if (!row) {
+            return;
+        }
+        
+        row.className = row.className.replace(/status-\S+/, `status-${req.status}`);
+        const badge = row.querySelector('.status-badge');
+        if (badge) {
+            badge.className = `status-badge status-${req.status}`;
+            badge.textContent = STATUS_NAMES[req.status] || req.status;
+        }
+        const select = row.querySelector('.status-select');
+        if (select) {
+            select.value = req.status;
+            select.form.elements.expected_status.value = req.status;
+        }
+    });
+}
+
+// Живое обновление панели специалиста через поток событий (SSE)
+const TASK_STATUS_OPTIONS = {
+    pending: [['pending', 'Ожидание'], ['in_progress', 'Взять в работу']],
+    in_progress: [['in_progress', 'В работе'], ['completed', 'Завершено']]
+};
+
+// Пауза перед перезагрузкой панели, если сервер отказал в потоке событий (мс)
+const EVENTS_RETRY_INTERVAL = 30000;
+
+function connectTaskEvents() {
+    const source = new EventSource('/api/events');
+    source.addEventListener('created', event => updateTaskCard(JSON.parse(event.data)));
+    source.addEventListener('status', event => updateTaskCard(JSON.parse(event.data)));
+    // Пропущены события - проще загрузить страницу заново
+    source.addEventListener('resync', () => window.location.reload());
+    // 503 - все места для потоков событий заняты, браузер сам не переподключается:
+    // панель обновляется перезагрузкой, которая заодно снова пробует подключиться
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => window.location.reload(), EVENTS_RETRY_INTERVAL);
+        }
+    });
+}
+
+function buildTaskCard(req) {
+    const card = document.getElementById('taskCardTemplate').content.firstElementChild.cloneNode(true);
+    const description = req.status === 'pending' && req.problem_description.length > 150
+        ? req.problem_description.substring(0, 147) + '...'
+        : req.problem_description;
+    
+    card.classList.add(`status-${req.status}`);
+    card.dataset.id = req.id;
+    card.querySelector('.task-computer').textContent = req.computer_number;
+    card.querySelector('.task-id').textContent = `#${req.id}`;
+    card.querySelector('.task-location').textContent = req.location;
+    card.querySelector('.priority-badge').classList.add(`priority-${req.priority}`);
+    card.querySelector('.priority-badge').textContent = req.priority;
+    card.querySelector('.problem-text').textContent = description;
+    card.querySelector('.task-author').textContent = req.author;
+    card.querySelector('.task-created').textContent = req.created_at;
+    card.querySelector('form').action = `/requests/${req.id}/update_status`;
+    card.querySelector('input[name="expected_status"]').value = req.status;
+    
+    const select = card.querySelector('.status-select');
+    TASK_STATUS_OPTIONS[req.status].forEach(([value, label]) => {
+        select.add(new Option(label, value, false, value === req.status));
+    });
+    return card;
+}
+
+// Перенос карточки в нужный раздел или удаление завершенной заявки
+function updateTaskCard(req) {
+    const existing = document.querySelector(`.task-card[data-id="${req.id}"]`);
+    if (existing) {
+        existing.remove();
+    }
+    
+    const grids = { pending: 'pendingTasks', in_progress: 'inProgressTasks' };
+    if (grids[req.status]) {
+        document.getElementById(grids[req.status]).prepend(buildTaskCard(req));
+    }
+    
+    document.getElementById('pendingEmpty').style.display =
+        document.querySelector('#pendingTasks .task-card') ? 'none' : '';
+    document.getElementById('inProgressEmpty').style.display =
+        document.querySelector('#inProgressTasks .task-card') ? 'none' : '';
+    document.getElementById('tasksTotal').textContent =
+        document.querySelectorAll('.tasks-grid .task-card').length;
+}
+
+// Взять в работу следующую заявку из очереди (старейшую с наивысшим приоритетом)
+function claimNextTask() {
+    fetch('/api/tasks/claim', { method: 'POST' })
+        .then(response => response.json().then(data => ({ ok: response.ok, data })))
+        .then(({ ok, data }) => {
+            if (!ok) {
+                alert(data.error || 'Не удалось взять заявку');
+                return;
+            }
+            updateTaskCard(data.request);
         })
         .catch(error => console.error('Ошибка:', error));
 }
@@ -53,9 +183,16 @@ document.addEventListener('DOMContentLoaded', function() {
     setInterval(updateDateTime, 1000);
     updateDateTime();
     
-    // Загружаем заявки, если на странице есть таблица
-    if (document.querySelector('.requests-table')) {
-        loadRequests();
+    // Опрос изменений - только для списка заявок с отметкой от сервера
+    const pollTable = document.querySelector('.requests-table[data-watermark]');
+    if (pollTable) {
+        requestsWatermark = pollTable.dataset.watermark;
+        setInterval(loadRequests, POLL_INTERVAL);
+    }
+    
+    // Панель специалиста получает изменения заявок потоком событий
+    if (document.getElementById('taskCardTemplate') && window.EventSource) {
+        connectTaskEvents();
     }
     
     // Добавляем обработчики для форм
@@ -0,0 +1,85 @@
+"""
+Общие фикстуры: приложение с базой во временном файле
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+PASSWORDS = {'admin': 'admin123', 'technician1': 'tech123', 'student1': 'student123', 'student2': 'student123'}
+
+
+@pytest.fixture(scope='session')
+def application():
+    directory = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory.name, 'test.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as application
+    
+    with application.app.app_context():
+        application.db.create_all()
+        application.ensure_search_index()
+        application.create_default_users()
+    yield application
+    with application.app.app_context():
+        application.db.engine.dispose()
+    directory.cleanup()
+
+
+@pytest.fixture
+def login(application):
+    """Клиент, вошедший под пользователем username"""
+    def login(username):
+        client = application.app.test_client()
+        client.post('/login', data={'username': username, 'password': PASSWORDS[username]})
+        return client
+    return login
+
+
+@pytest.fixture
+def counters(application):
+    """Проверка: поддерживаемые счетчики статистики совпадают с пересчетом по заявкам.
+
+    Тесты добавляют заявки прямо в таблицу, поэтому перед проверяемым действием
+    счетчики нужно перестроить (rebuild_request_counters).
+    """
+    db, counter = application.db, application.RequestCounter
+    
+    def snapshot():
+        return {(row.status, row.priority, row.location): row.count
+                for row in db.session.query(counter).filter(counter.count != 0)}
+    
+    def check():
+        with application.app.app_context():
+            maintained = snapshot()
+            application.rebuild_request_counters()
+            assert maintained == snapshot()
+    return check
+
+
+@pytest.fixture
+def add_pending(application):
+    """Функция: count ожидающих заявок с разными приоритетами и аудиториями, их id"""
+    db, RepairRequest = application.db, application.RepairRequest
+    
+    def add_pending(count):
+        now = datetime.utcnow()
+        with application.app.app_context():
+            user_id = db.session.query(application.User.id).filter_by(username='student1').scalar()
+            ids = db.session.execute(RepairRequest.__table__.insert().returning(RepairRequest.id), [{
+                'user_id': user_id,
+                'computer_number': f'PC-{900 + index}',
+                'location': f'Аудитория {index % 3}',
+                'problem_description': 'Не загружается система',
+                'status': 'pending',
+                'priority': application.REQUEST_PRIORITIES[index % 3],
+                'created_at': now - timedelta(minutes=index),
+                'updated_at': now - timedelta(minutes=index),
+            } for index in range(count)]).scalars().all()
+            db.session.commit()
+            application.rebuild_request_counters()
+        return ids
+    return add_pending
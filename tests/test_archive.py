@@ -0,0 +1,30 @@
+"""
+Архив завершенных заявок: поиск остается прозрачным с параметром archived
+"""
+
+from datetime import datetime
+
+# Дата, до которой архивируются только заявки этого теста
+LONG_AGO = datetime(2000, 1, 1)
+ARCHIVE_AFTER_DAYS = (datetime.utcnow() - datetime(2005, 1, 1)).days
+
+
+def test_search_finds_archived_requests_on_request(application, login):
+    db, RepairRequest = application.db, application.RepairRequest
+    with application.app.app_context():
+        author_id = db.session.query(application.User.id).filter_by(username='student1').scalar()
+        db.session.add(RepairRequest(user_id=author_id, computer_number='PC-ARCH77', location='Аудитория 77',
+                                     problem_description='Сгорел блок питания', status='completed',
+                                     priority='low', created_at=LONG_AGO, updated_at=LONG_AGO))
+        db.session.commit()
+        assert application.archive_completed_requests(older_than_days=ARCHIVE_AFTER_DAYS) == 1
+    
+    for username in ('technician1', 'student1'):
+        client = login(username)
+        assert client.get('/api/search?q=ARCH77').get_json()['results'] == []
+        results = client.get('/api/search?q=ARCH77&archived=1').get_json()['results']
+        assert [(row['computer_number'], row['archived']) for row in results] == [('PC-ARCH77', True)]
+        assert 'В архиве' in client.get('/search?q=ARCH77&archived=1').get_data(as_text=True)
+    
+    # Чужие заявки из архива пользователю не видны
+    assert login('student2').get('/api/search?q=ARCH77&archived=1').get_json()['results'] == []
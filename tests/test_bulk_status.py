@@ -0,0 +1,75 @@
+"""
+Пакетная смена статусов с оптимистической блокировкой (POST /api/requests/status)
+"""
+
+from datetime import timedelta
+
+
+def versions(application, ids):
+    with application.app.app_context():
+        rows = application.db.session.query(application.RepairRequest).filter(application.RepairRequest.id.in_(ids))
+        return {row.id: row.updated_at for row in rows}
+
+
+def test_results_for_each_outcome(application, login, add_pending, counters):
+    ids = add_pending(5)
+    version = {request_id: updated_at.isoformat() for request_id, updated_at in versions(application, ids).items()}
+    stale = (versions(application, ids)[ids[2]] - timedelta(seconds=1)).isoformat()
+    client = login('technician1')
+    
+    response = client.post('/api/requests/status', json={'updates': [
+        {'id': ids[0], 'status': 'in_progress', 'expected_updated_at': version[ids[0]]},
+        {'id': ids[1], 'status': 'completed', 'expected_updated_at': version[ids[1]]},
+        {'id': ids[2], 'status': 'in_progress', 'expected_updated_at': stale},
+        {'id': ids[3], 'status': 'pending', 'expected_updated_at': version[ids[3]]},
+        {'id': 10 ** 9, 'status': 'in_progress', 'expected_updated_at': version[ids[0]]},
+        {'id': 'abc', 'status': 'in_progress', 'expected_updated_at': version[ids[0]]},
+        {'id': ids[4], 'status': 'broken', 'expected_updated_at': version[ids[4]]},
+        {'id': ids[4], 'status': 'completed'},
+        {'id': ids[0], 'status': 'completed', 'expected_updated_at': version[ids[0]]},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [result['result'] for result in data['results']] == [
+        'updated', 'updated', 'conflict', 'unchanged', 'not_found', 'invalid', 'invalid', 'invalid', 'invalid']
+    assert data['summary'] == {'updated': 2, 'conflict': 1, 'unchanged': 1, 'not_found': 1, 'invalid': 4}
+    # При конфликте клиент получает текущие статус и версию
+    assert data['results'][2]['status'] == 'pending'
+    assert data['results'][2]['version'] == version[ids[2]]
+    
+    with application.app.app_context():
+        technician_id = application.db.session.query(application.User.id).filter_by(username='technician1').scalar()
+        rows = {row.id: row for row in application.db.session.query(application.RepairRequest)
+                .filter(application.RepairRequest.id.in_(ids))}
+    assert [rows[request_id].status for request_id in ids] == ['in_progress', 'completed', 'pending', 'pending', 'pending']
+    assert rows[ids[0]].assignee_id == technician_id
+    assert rows[ids[0]].updated_at.isoformat() == data['results'][0]['version']
+    counters()
+
+
+def test_counters_follow_each_group(application, login, add_pending, counters):
+    # Девять заявок в трех группах (приоритет, аудитория) меняют статус одним запросом
+    ids = add_pending(9)
+    with application.app.app_context():
+        before = application.get_request_stats()
+    version = versions(application, ids)
+    client = login('technician1')
+    
+    response = client.post('/api/requests/status', json={'updates': [
+        {'id': request_id, 'status': 'completed' if index % 2 else 'in_progress',
+         'expected_updated_at': version[request_id].isoformat()}
+        for index, request_id in enumerate(ids)]})
+    assert response.get_json()['summary'] == {'updated': 9}
+    
+    with application.app.app_context():
+        after = application.get_request_stats()
+    assert after['pending'] == before['pending'] - 9
+    assert after['in_progress'] == before['in_progress'] + 5
+    assert after['completed'] == before['completed'] + 4
+    counters()
+
+
+def test_rejects_malformed_body(login):
+    client = login('technician1')
+    assert client.post('/api/requests/status', json={'updates': []}).status_code == 400
+    assert client.post('/api/requests/status', json=[1, 2]).status_code == 400
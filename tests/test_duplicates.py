@@ -0,0 +1,29 @@
+"""
+Заполнение ключей поиска дублей у старых заявок
+"""
+
+from datetime import datetime
+
+
+def test_backfill_keeps_updated_at(application):
+    db, RepairRequest = application.db, application.RepairRequest
+    old = datetime(2024, 1, 1, 12, 30)
+    with application.app.app_context():
+        user_id = db.session.query(application.User.id).filter_by(username='student1').scalar()
+        result = db.session.execute(RepairRequest.__table__.insert().returning(RepairRequest.id), [{
+            'user_id': user_id,
+            'computer_number': f'pc 7{index}',
+            'location': 'Аудитория 7',
+            'problem_description': 'Не работает клавиатура',
+            'status': 'completed',
+            'priority': 'low',
+            'created_at': old,
+            'updated_at': old,
+        } for index in range(3)])
+        ids = result.scalars().all()
+        db.session.commit()
+        
+        assert application.backfill_duplicate_keys() >= len(ids)
+        rows = db.session.query(RepairRequest).filter(RepairRequest.id.in_(ids)).all()
+        assert [row.updated_at for row in rows] == [old] * len(ids)
+        assert sorted(row.computer_key for row in rows) == ['PC70', 'PC71', 'PC72']
@@ -0,0 +1,23 @@
+"""
+Ограничение числа одновременных потоков событий (SSE) в процессе
+"""
+
+
+def test_events_over_limit_get_503(application, login, monkeypatch):
+    monkeypatch.setattr(application.event_broker, 'max_subscribers', 1)
+    client = login('technician1')
+    
+    first = client.get('/api/events', buffered=False)
+    assert first.status_code == 200
+    assert next(first.response) == b'retry: 5000\n\n'
+    
+    refused = client.get('/api/events', buffered=False)
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '30'
+    # Обычные запросы обслуживаются, пока поток событий открыт
+    assert client.get('/api/stats').status_code == 200
+    
+    first.close()
+    second = client.get('/api/events', buffered=False)
+    assert second.status_code == 200
+    second.close()
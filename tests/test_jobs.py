@@ -0,0 +1,31 @@
+"""
+Очередь фоновых задач: повторная выдача задач с истекшей арендой
+"""
+
+from datetime import datetime, timedelta
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(application):
+    db, Job = application.db, application.Job
+    max_attempts = application.app.config['JOBS_MAX_ATTEMPTS']
+    now = datetime.utcnow()
+    with application.app.app_context():
+        db.session.query(Job).delete()
+        # Обе задачи "running" с истекшей арендой: их обработчики упали вместе с процессом
+        exhausted = Job(kind='test', payload='{}', status='running', attempts=max_attempts,
+                        run_after=now - timedelta(hours=2))
+        retryable = Job(kind='test', payload='{}', status='running', attempts=1,
+                        run_after=now - timedelta(hours=1))
+        db.session.add_all([exhausted, retryable])
+        db.session.commit()
+        exhausted_id, retryable_id = exhausted.id, retryable.id
+        
+        claimed = application.claim_job()
+        assert claimed.id == retryable_id
+        assert claimed.attempts == 2
+        
+        exhausted = db.session.get(Job, exhausted_id, populate_existing=True)
+        assert exhausted.status == 'failed'
+        assert exhausted.attempts == max_attempts
+        assert exhausted.last_error
+        assert application.claim_job() is None
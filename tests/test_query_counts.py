@@ -0,0 +1,73 @@
+"""
+Число SQL-запросов на страницу не должно зависеть от числа заявок (N+1)
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+ROWS = 200
+ENDPOINTS = [
+    ('/requests', 'admin'),
+    ('/api/requests', 'admin'),
+    ('/technician/tasks', 'technician1'),
+    ('/api/requests/export', 'admin'),
+]
+
+
+def add_requests(application, count):
+    """count заявок от пользователей разных ролей, во всех статусах"""
+    rng = random.Random(count)
+    with application.app.app_context():
+        db = application.db
+        user_ids = [user_id for user_id, in db.session.query(application.User.id)]
+        now = datetime.utcnow()
+        db.session.execute(application.RepairRequest.__table__.insert(), [{
+            'user_id': rng.choice(user_ids),
+            'computer_number': f'PC-{rng.randrange(1, 500)}',
+            'location': f'Аудитория {rng.randrange(1, 20)}',
+            'problem_description': 'Не включается компьютер',
+            'status': rng.choice(application.REQUEST_STATUSES),
+            'priority': rng.choice(application.REQUEST_PRIORITIES),
+            'created_at': now - timedelta(minutes=index),
+            'updated_at': now - timedelta(minutes=index),
+        } for index in range(count)])
+        db.session.commit()
+
+
+def count_statements(application, client, path):
+    """Число SQL-запросов за один ответ (с чтением потокового тела)"""
+    with application.app.app_context():
+        engine = application.db.engine
+    statements = []
+    
+    def on_execute(*args):
+        statements.append(1)
+    
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        response = client.get(path)
+        response.get_data()
+        assert response.status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return len(statements)
+
+
+def measure(application, login):
+    counts = {}
+    for path, username in ENDPOINTS:
+        client = login(username)
+        # Первый запрос прогревает кэши; считается второй
+        client.get(path).get_data()
+        counts[path] = count_statements(application, client, path)
+    return counts
+
+
+def test_query_count_does_not_grow_with_rows(application, login):
+    add_requests(application, ROWS)
+    small = measure(application, login)
+    add_requests(application, ROWS * 9)
+    large = measure(application, login)
+    assert large == small
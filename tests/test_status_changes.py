@@ -0,0 +1,67 @@
+"""
+Смена статусов при одновременной работе специалистов
+"""
+
+import threading
+
+CLAIMERS = 20
+CLAIMS_EACH = 3
+
+
+def test_concurrent_claims_are_distinct(application, add_pending, counters):
+    db, RepairRequest = application.db, application.RepairRequest
+    add_pending(CLAIMERS * CLAIMS_EACH)
+    with application.app.app_context():
+        technician_id = db.session.query(application.User.id).filter_by(username='technician1').scalar()
+    
+    claimed = []
+    errors = []
+    start = threading.Barrier(CLAIMERS)
+    
+    def claim():
+        start.wait()
+        try:
+            for _ in range(CLAIMS_EACH):
+                with application.app.app_context():
+                    repair_request = application.claim_next_request(technician_id)
+                    if repair_request is not None:
+                        claimed.append(repair_request.id)
+        except Exception as error:
+            errors.append(error)
+    
+    threads = [threading.Thread(target=claim) for _ in range(CLAIMERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert len(claimed) == CLAIMERS * CLAIMS_EACH
+    assert len(set(claimed)) == len(claimed)
+    with application.app.app_context():
+        rows = db.session.query(RepairRequest).filter(RepairRequest.id.in_(claimed)).all()
+        assert {(row.status, row.assignee_id) for row in rows} == {('in_progress', technician_id)}
+        transitions = db.session.query(application.StatusTransition).filter(
+            application.StatusTransition.request_id.in_(claimed),
+            application.StatusTransition.to_status == 'in_progress').count()
+        assert transitions == len(claimed)
+    counters()
+
+
+def test_stale_expected_status_is_rejected(application, login, add_pending, counters):
+    db, RepairRequest = application.db, application.RepairRequest
+    request_id, = add_pending(1)
+    client = login('technician1')
+    url = f'/requests/{request_id}/update_status'
+    
+    response = client.post(url, data={'status': 'in_progress', 'expected_status': 'pending'})
+    assert response.status_code == 302
+    # Второй специалист видел заявку еще ожидающей
+    response = client.post(url, data={'status': 'completed', 'expected_status': 'pending'}, follow_redirects=True)
+    assert 'уже изменил другой специалист' in response.get_data(as_text=True)
+    
+    with application.app.app_context():
+        repair_request = db.session.get(RepairRequest, request_id)
+        assert repair_request.status == 'in_progress'
+        assert repair_request.assignee_id is not None
+    counters()
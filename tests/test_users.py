@@ -0,0 +1,35 @@
+"""
+Создание пользователей администратором
+"""
+
+
+def test_create_user_hashes_in_password_pool(application, login, monkeypatch):
+    client = login('admin')
+    calls = []
+    run_in_password_pool = application.run_in_password_pool
+    
+    def counting_pool(function, *args):
+        calls.append(function)
+        return run_in_password_pool(function, *args)
+    
+    monkeypatch.setattr(application, 'run_in_password_pool', counting_pool)
+    client.post('/users/create', data={'username': 'newtech', 'password': 'secret1',
+                                       'full_name': 'Новый специалист', 'role': 'technician'})
+    assert calls == [application.hash_password]
+    assert application.app.test_client().post(
+        '/login', data={'username': 'newtech', 'password': 'secret1'}).status_code == 302
+
+
+def test_create_user_when_password_pool_busy(application, login, monkeypatch):
+    client = login('admin')
+    
+    def busy(function, *args):
+        raise application.PasswordPoolBusy()
+    
+    monkeypatch.setattr(application, 'run_in_password_pool', busy)
+    response = client.post('/users/create', data={'username': 'busytech', 'password': 'secret1',
+                                                  'full_name': 'Занятый', 'role': 'technician'},
+                           follow_redirects=True)
+    assert 'Сервер перегружен' in response.get_data(as_text=True)
+    with application.app.app_context():
+        assert application.User.query.filter_by(username='busytech').first() is None